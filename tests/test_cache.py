@@ -0,0 +1,28 @@
+"""
+Check that the on-disk dataset cache never serves a dataset preprocessed with other settings.
+"""
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets.cache import DiskCache
+from washing_learning.vision.preprocessing import SimplePreprocessor
+
+
+def test_grayscale_run_does_not_reuse_the_colour_dataset(tmp_path):
+    source = tmp_path / "images"
+    source.mkdir()
+    for i in range(3):
+        cv2.imwrite(str(source / f"{i}.png"), np.full((20, 20, 3), i, dtype=np.uint8))
+    cache = DiskCache(str(tmp_path / "cache"))
+    preprocessors = [SimplePreprocessor(8, 8)]
+
+    colour = cache.get_or_create(str(source), preprocessors)
+    assert colour[0].shape == (8, 8, 3) and colour.meta["flags"] == cv2.IMREAD_COLOR
+    assert cache.get(str(source), preprocessors, cv2.IMREAD_GRAYSCALE) is None
+
+    gray = cache.get_or_create(str(source), preprocessors, cv2.IMREAD_GRAYSCALE)
+    assert gray.path != colour.path
+    assert gray[0].shape == (8, 8) and gray.meta["flags"] == cv2.IMREAD_GRAYSCALE
+    assert cache.get(str(source), preprocessors).path == colour.path
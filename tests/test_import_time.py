@@ -0,0 +1,59 @@
+"""
+Check that importing washing_learning and its subpackages stays cheap, i.e. that no heavy dependency is imported
+before one of its names is used.
+"""
+# Standard libraries
+import json
+import pkgutil
+import subprocess
+import sys
+from typing import List
+
+# Third-party libraries
+import pytest
+
+# Local libraries
+import washing_learning
+
+# The import of a single package, measured in a fresh interpreter, must stay below this budget in seconds
+IMPORT_BUDGET = 0.5
+HEAVY_MODULES = ["cv2", "gensim", "matplotlib", "sklearn", "tensorflow", "torch"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {package}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _packages() -> List[str]:
+    return [washing_learning.__name__] + [
+        module.name
+        for module in pkgutil.walk_packages(
+            washing_learning.__path__, prefix=f"{washing_learning.__name__}."
+        )
+        if module.ispkg
+    ]
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="names are imported eagerly before Python 3.7"
+)
+@pytest.mark.parametrize("package", _packages())
+def test_import_is_lazy(package: str) -> None:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(package=package)],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    probe = json.loads(output)
+    heavy = [
+        name for name in probe["modules"] if name.split(".", 1)[0] in HEAVY_MODULES
+    ]
+    assert not heavy, f"importing {package} imported {heavy}"
+    assert probe["elapsed"] < IMPORT_BUDGET, (
+        f"importing {package} took {probe['elapsed']:.3f} s, more than the"
+        f" {IMPORT_BUDGET} s budget"
+    )
@@ -0,0 +1,72 @@
+"""
+Check that the fused stages of a pipeline compute the same batches as the unfused chain of preprocessors.
+"""
+# Standard libraries
+from typing import List, Optional
+
+# Third-party libraries
+import numpy as np
+import pytest
+
+# Local libraries
+from washing_learning.vision.preprocessing import (
+    BasePreprocessor,
+    Pipeline,
+    SimplePreprocessor,
+    SimpleScaler,
+)
+
+
+def _images(channels: int, count: int = 4) -> List[np.ndarray]:
+    rng = np.random.RandomState(0)
+    return list(rng.randint(0, 256, size=(count, 30, 40, channels), dtype=np.uint8))
+
+
+def _unfused(
+    preprocessors: List[BasePreprocessor],
+    images: List[np.ndarray],
+    dtype: Optional[np.dtype] = None,
+) -> np.ndarray:
+    outputs = []
+    for image in images:
+        for preprocessor in preprocessors:
+            image = preprocessor.preprocess(image).reshape(
+                preprocessor.output_shape(image.shape)
+            )
+        outputs.append(image if dtype is None else image.astype(dtype))
+    return np.stack(outputs)
+
+
+@pytest.mark.parametrize("channels", [3, 1])
+@pytest.mark.parametrize(
+    "preprocessors, dtype",
+    [
+        ([SimplePreprocessor(16, 12), SimpleScaler(dtype="float32")], None),
+        ([SimplePreprocessor(16, 12), SimpleScaler(use_lut=False)], np.float32),
+        ([SimplePreprocessor(16, 12)], np.float32),
+        ([SimplePreprocessor(16, 12), SimpleScaler(2.0), SimpleScaler(127.5)], None),
+        ([SimpleScaler(dtype="float32"), SimplePreprocessor(16, 12)], None),
+    ],
+)
+def test_fused_batch_matches_the_unfused_chain(preprocessors, dtype, channels):
+    images = _images(channels)
+    pipeline = Pipeline(preprocessors, dtype=dtype)
+    expected = _unfused(preprocessors, images, dtype)
+
+    batch = pipeline.preprocess_batch(images)
+    assert batch.shape == expected.shape and batch.dtype == expected.dtype
+    np.testing.assert_allclose(batch, expected, rtol=1e-6)
+
+    out = np.empty_like(expected)
+    assert pipeline.preprocess_batch(np.stack(images), out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-6)
+
+
+def test_fused_batch_rejects_a_wrong_output():
+    pipeline = Pipeline([SimplePreprocessor(16, 12), SimpleScaler()], dtype=np.float32)
+    with pytest.raises(TypeError):
+        pipeline.preprocess_batch(_images(3), out=np.empty((4, 12, 16, 3)))
+    with pytest.raises(ValueError):
+        pipeline.preprocess_batch(
+            _images(3), out=np.empty((4, 16, 12, 3), dtype=np.float32)
+        )
@@ -0,0 +1,71 @@
+"""
+Check that the shared memory ring delivers every batch and surfaces the failures of its workers.
+"""
+# Standard libraries
+import multiprocessing
+import sys
+from typing import List
+
+# Third-party libraries
+import cv2
+import numpy as np
+import pytest
+
+# Local libraries
+from washing_learning.vision.preprocessing import SimplePreprocessor
+
+transport = pytest.importorskip("washing_learning.vision.preprocessing.transport")
+
+
+def _write_images(root, count: int) -> List[str]:
+    paths = []
+    for i in range(count):
+        paths.append(str(root / f"{i:02d}.png"))
+        cv2.imwrite(paths[-1], np.full((20, 20, 3), i, dtype=np.uint8))
+    return paths
+
+
+def _fill_then_exit(ring, preprocessor, paths) -> None:
+    transport.fill_ring(ring, preprocessor, paths)
+    sys.exit(3)
+
+
+def _start(target, ring, chunks) -> List[multiprocessing.Process]:
+    workers = [
+        multiprocessing.Process(
+            target=target, args=(ring, SimplePreprocessor(8, 8), chunk)
+        )
+        for chunk in chunks
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def test_ring_yields_every_batch(tmp_path):
+    paths = _write_images(tmp_path, 10)
+    with transport.SharedBatchRing(2, (4, 8, 8, 3)) as ring:
+        workers = _start(transport.fill_ring, ring, [paths[:5], paths[5:]])
+        values = [
+            int(value) for batch in ring.batches(workers) for value in batch[:, 0, 0, 0]
+        ]
+    assert sorted(values) == list(range(10))
+
+
+def test_ring_raises_and_releases_the_slot_of_a_failed_worker(tmp_path):
+    paths = _write_images(tmp_path, 3) + [str(tmp_path / "missing.png")]
+    with transport.SharedBatchRing(2, (4, 8, 8, 3)) as ring:
+        workers = _start(transport.fill_ring, ring, [paths])
+        with pytest.raises(RuntimeError, match="missing.png"):
+            list(ring.batches(workers))
+        workers[0].join()
+        # Both slots are free again
+        assert {ring.acquire(timeout=1)[0] for _ in range(2)} == {0, 1}
+
+
+def test_ring_raises_on_a_non_zero_exit_code_after_done(tmp_path):
+    paths = _write_images(tmp_path, 4)
+    with transport.SharedBatchRing(2, (4, 8, 8, 3)) as ring:
+        workers = _start(_fill_then_exit, ring, [paths])
+        with pytest.raises(RuntimeError, match=r"exit codes \[3\]"):
+            list(ring.batches(workers))
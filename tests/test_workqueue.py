@@ -0,0 +1,99 @@
+"""
+Check that the filesystem work queue processes every chunk exactly once, whatever the crashes of its workers.
+"""
+# Standard libraries
+import multiprocessing
+import os
+import time
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets import workqueue
+from washing_learning.vision.datasets.workqueue import WorkQueue, run_worker
+from washing_learning.vision.preprocessing import SimplePreprocessor
+
+
+def _fill(root: str, chunks: int, age: float = 0.0) -> WorkQueue:
+    queue = WorkQueue(root)
+    queue.fill([f"image-{i}.png" for i in range(2 * chunks)], chunk_size=2)
+    for name in os.listdir(os.path.join(root, "todo")):
+        path = os.path.join(root, "todo", name)
+        os.utime(path, (time.time() - age, time.time() - age))
+    return queue
+
+
+def test_claim_is_not_stale_right_after_the_rename(tmp_path, monkeypatch):
+    queue = _fill(str(tmp_path), chunks=3, age=3600.0)
+    rename = os.rename
+
+    def rename_then_recover(source, target):
+        rename(source, target)
+        # Another worker recovering stale claims right after the rename
+        assert queue.recover(600.0) == 0
+
+    monkeypatch.setattr(workqueue.os, "rename", rename_then_recover)
+    claim = queue.claim("worker")
+    assert claim is not None and os.path.exists(claim.path)
+
+
+def test_claim_skips_a_chunk_recovered_right_after_the_rename(tmp_path, monkeypatch):
+    queue = _fill(str(tmp_path), chunks=2)
+    rename = os.rename
+    recovered = []
+
+    def rename_then_lose(source, target):
+        rename(source, target)
+        if not recovered:
+            # The claim is put back into the queue before the worker reads it
+            recovered.append(os.path.basename(source))
+            rename(target, source)
+
+    monkeypatch.setattr(workqueue.os, "rename", rename_then_lose)
+    claim = queue.claim("worker")
+    assert claim is not None and claim.name != recovered[0]
+
+
+def _crash(root: str) -> None:
+    WorkQueue(root).claim("crashed")
+    os._exit(1)
+
+
+def test_workers_recover_the_chunks_of_a_crashed_worker(tmp_path):
+    source = tmp_path / "images"
+    source.mkdir()
+    paths = []
+    for i in range(50):
+        paths.append(str(source / f"{i:02d}.png"))
+        cv2.imwrite(paths[-1], np.full((20, 20, 3), i, dtype=np.uint8))
+    root, output = str(tmp_path / "queue"), str(tmp_path / "output")
+    queue = WorkQueue(root)
+    assert queue.fill(paths, chunk_size=4) == 13
+
+    crashed = multiprocessing.Process(target=_crash, args=(root,))
+    crashed.start()
+    crashed.join()
+    assert crashed.exitcode == 1
+    assert queue.status().claimed == 1
+
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(root, output, SimplePreprocessor(8, 8)),
+            kwargs={"stale_after": 1.0, "poll": 0.1},
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert tuple(queue.status()) == (0, 0, 13)
+
+    shards = sorted(os.listdir(output))
+    assert len(shards) == 13
+    images = np.concatenate([np.load(os.path.join(output, shard)) for shard in shards])
+    assert images[:, 0, 0, 0].tolist() == list(range(50))
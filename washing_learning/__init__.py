@@ -1,4 +1,9 @@
+from ._lazy import attach
 from ._version import get_versions
 
 __version__ = get_versions()["version"]
 del get_versions
+
+__getattr__, __dir__, __all__ = attach(
+    __name__, submodules=["loggers", "nlp", "schedulers", "vision"]
+)
@@ -0,0 +1,61 @@
+"""
+Implement the lazy resolution of the public names of every subpackage.
+
+A subpackage declares its submodules and the names they export, these are only imported on first access through the
+module-level `__getattr__` of PEP 562. Importing a subpackage is thus nearly free, a worker needing one helper does
+not pay for torch, OpenCV or gensim.
+
+Example:
+    >>> __getattr__, __dir__, __all__ = attach(
+    >>>     __name__, submodules=["utils"], attributes={"warmup": ["LinearWarmupScheduler"]}
+    >>> )
+"""
+# Standard libraries
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+__all__ = ["attach"]
+
+
+def attach(
+    package_name: str,
+    submodules: Sequence[str] = (),
+    attributes: Optional[Dict[str, Sequence[str]]] = None,
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]], List[str]]:
+    """
+    This function returns the `__getattr__`, `__dir__` and `__all__` of a package resolving its names lazily.
+
+    Args:
+        package_name (str) : the `__name__` of the package.
+        submodules (list of str) : the submodules (or subpackages) reachable as attributes of the package.
+        attributes (dict) : maps the name of a submodule to the public names it exports.
+    """
+    attributes = attributes or {}
+    submodules = set(submodules) | set(attributes)
+    origins = {
+        name: submodule for submodule, names in attributes.items() for name in names
+    }
+    package = sys.modules[package_name]
+
+    def __getattr__(name: str) -> Any:
+        if name in submodules:
+            value = importlib.import_module(f"{package_name}.{name}")
+        elif name in origins:
+            module = importlib.import_module(f"{package_name}.{origins[name]}")
+            value = getattr(module, name)
+        else:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        # Cache the value so that __getattr__ is not called again for this name
+        setattr(package, name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(package)) | submodules | set(origins))
+
+    if sys.version_info < (3, 7):
+        # Module-level __getattr__ does not exist before Python 3.7, every name is imported eagerly
+        for name in sorted(submodules | set(origins)):
+            __getattr__(name)
+
+    return __getattr__, __dir__, sorted(origins)
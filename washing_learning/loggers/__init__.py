@@ -1,2 +1,9 @@
-from washing_learning.loggers.tensorboard import *
-from washing_learning.loggers.time_loggers import *
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    attributes={
+        "tensorboard": ["TensorBoardLogger"],
+        "time_loggers": ["chronometer"],
+    },
+)
@@ -0,0 +1,3 @@
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, submodules=["graphics"])
@@ -1 +1,6 @@
-from washing_learning.nlp.graphics import *
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    attributes={"embedding": ["visualize_embedding_from_gensim_word2vec_model"]},
+)
@@ -2,4 +2,8 @@
 Every custom schedulers will reside in this module.
 """
 
-from washing_learning.schedulers.warmup import *
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__, attributes={"warmup": ["LinearWarmupScheduler"]}
+)
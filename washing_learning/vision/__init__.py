@@ -2,3 +2,11 @@
 This API implements the classes and functions to avoid having to do boilerplate code and simplify the code by making it
 higher-level. This module focuses solely on Computer Vision issues.
 """
+
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["datasets", "preprocessing"],
+    attributes={"utils": ["collate_padded", "compute_padding_conv2d", "padded_size"]},
+)
@@ -0,0 +1,20 @@
+"""
+Every dataset loading helper will reside in this module.
+"""
+
+from washing_learning._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    attributes={
+        "async_loader": ["AsyncImageLoader"],
+        "cache": ["CachedDataset", "DiskCache", "manifest_hash"],
+        "dataloaders": ["IMAGE_EXTENSIONS", "ImageDataLoader", "walk_images"],
+        "incremental": ["IncrementalJob", "JobReport", "file_digest"],
+        "memory": ["CacheStats", "CachedPreprocessor", "MemoryCache"],
+        "prefetch": ["PrefetchStats", "Prefetcher"],
+        "records": ["RecordReader", "RecordWriter", "write_records"],
+        "sampling": ["AspectRatioBucketSampler", "BucketBatch", "make_buckets"],
+        "workqueue": ["Claim", "QueueStatus", "WorkQueue", "run_worker"],
+    },
+)
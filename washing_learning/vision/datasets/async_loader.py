@@ -0,0 +1,156 @@
+"""
+Implement an asyncio dataloader overlapping the file reads with the decoding and the preprocessing.
+
+On slow or network-mounted volumes, reading the files one after the other leaves the CPU idle while waiting for
+them. :class:`AsyncImageLoader` keeps up to `max_reads` reads in flight and hands each file, as soon as its bytes
+arrived, to a thread pool running the `load_bytes` of the preprocessors, which decodes and preprocesses the image as
+their `load` does, e.g. at a reduced resolution or from a cache. At most `prefetch` batches of images are in flight,
+which bounds the memory whatever the size of the dataset.
+
+Example:
+    >>> loader = AsyncImageLoader("datasets/", [SimplePreprocessor(224, 224), SimpleScaler()], max_reads=64)
+    >>> async for batch in loader:
+    >>>     ...
+"""
+# Standard libraries
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Sequence, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets.dataloaders import IMAGE_EXTENSIONS, walk_images
+from washing_learning.vision.preprocessing.parallel import Preprocessors, _as_pipeline
+
+__all__ = ["AsyncImageLoader"]
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class AsyncImageLoader:
+    """
+    Stream images as fixed-size batches from an asyncio event loop. The reads run in their own thread pool so that a
+    slow volume never blocks the decoding, and the batches keep the order of the paths.
+
+    Args:
+        source (str or list of str) : the root directory of the dataset or the list of its image paths.
+        preprocessors (BasePreprocessor or list) : the preprocessors applied to each image, they must output a single
+        image shape.
+        batch_size (int) : the number of images per batch.
+        max_reads (int) : the maximum number of file reads in flight.
+        num_workers (int, optional) : the number of decoding threads, defaults to the number of CPUs.
+        prefetch (int) : the number of batches of images read and decoded in advance.
+        extensions (list of str) : the lowercase extensions of the images to load from a directory.
+        flags (int) : the OpenCV imdecode flags.
+        drop_last (bool) : drop the last batch if it is smaller than `batch_size`.
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Sequence[str]],
+        preprocessors: Preprocessors,
+        batch_size: int = 32,
+        max_reads: int = 16,
+        num_workers: Optional[int] = None,
+        prefetch: int = 2,
+        extensions: Sequence[str] = IMAGE_EXTENSIONS,
+        flags: int = cv2.IMREAD_COLOR,
+        drop_last: bool = False,
+    ) -> None:
+        if batch_size < 1 or max_reads < 1 or prefetch < 1:
+            raise ValueError("batch_size, max_reads and prefetch must be positive")
+        self.source = source
+        self.preprocessor = _as_pipeline(preprocessors)
+        self.batch_size = batch_size
+        self.max_reads = max_reads
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.flags = flags
+        self.drop_last = drop_last
+
+    def paths(self) -> Iterable[str]:
+        """
+        This method returns the paths of the images of the dataset, lazily for a directory.
+        """
+        if isinstance(self.source, str):
+            return walk_images(self.source, self.extensions)
+        return self.source
+
+    def _decode(self, data: bytes, path: str) -> np.ndarray:
+        """
+        This method decodes and preprocesses an image. It runs inside the decoding threads.
+
+        Args:
+            data (bytes) : the content of the image file.
+            path (str) : the path of the image, for the error message.
+        """
+        try:
+            return self.preprocessor.load_bytes(data, self.flags, path)
+        except IOError as error:
+            raise IOError(f"{path}: {error}") from error
+
+    async def _load(
+        self,
+        path: str,
+        semaphore: asyncio.Semaphore,
+        readers: ThreadPoolExecutor,
+        decoders: ThreadPoolExecutor,
+    ) -> np.ndarray:
+        loop = asyncio.get_event_loop()
+        async with semaphore:
+            data = await loop.run_in_executor(readers, _read_bytes, path)
+        return await loop.run_in_executor(decoders, self._decode, data, path)
+
+    @staticmethod
+    def _stack(images: List[np.ndarray]) -> np.ndarray:
+        batch = np.empty((len(images),) + images[0].shape, dtype=images[0].dtype)
+        for i, image in enumerate(images):
+            batch[i] = image
+        return batch
+
+    async def __aiter__(self) -> AsyncIterator[np.ndarray]:
+        semaphore = asyncio.Semaphore(self.max_reads)
+        pending: Deque[asyncio.Future] = deque()
+        max_pending = self.batch_size * self.prefetch
+        images: List[np.ndarray] = []
+        readers = ThreadPoolExecutor(self.max_reads)
+        decoders = ThreadPoolExecutor(self.num_workers)
+        try:
+            for path in self.paths():
+                pending.append(
+                    asyncio.ensure_future(
+                        self._load(path, semaphore, readers, decoders)
+                    )
+                )
+                # Waiting for the oldest image once the window is full is the backpressure
+                while len(pending) >= max_pending:
+                    images.append(await pending.popleft())
+                    if len(images) == self.batch_size:
+                        yield self._stack(images)
+                        images = []
+            while pending:
+                images.append(await pending.popleft())
+                if len(images) == self.batch_size:
+                    yield self._stack(images)
+                    images = []
+            if images and not self.drop_last:
+                yield self._stack(images)
+        finally:
+            # The consumer may stop early, pending images are not needed anymore
+            for future in pending:
+                future.cancel()
+            # Waiting for the reads in flight on a slow volume would block the event loop, the threads finish them
+            # in the background and skip the cancelled ones
+            readers.shutdown(wait=False)
+            decoders.shutdown(wait=False)
@@ -0,0 +1,291 @@
+"""
+Implement a persistent on-disk cache of preprocessed datasets stored as memory-mapped `.npy` shards.
+
+A dataset is cached under a key hashing the preprocessors configuration, the decoding flags and the manifest (path, size and
+modification time) of its source files. Later runs read the shards back zero-copy with `np.memmap`, without decoding
+nor preprocessing anything.
+
+Example:
+    >>> cache = DiskCache("~/.cache/washing_learning", max_bytes=50 * 2 ** 30)
+    >>> dataset = cache.get_or_create("datasets/", [SimplePreprocessor(224, 224), SimpleScaler(dtype="float32")])
+    >>> image = dataset[0]
+"""
+# Standard libraries
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets.dataloaders import walk_images
+from washing_learning.vision.preprocessing.parallel import (
+    ParallelExecutor,
+    Preprocessors,
+    _as_pipeline,
+)
+
+__all__ = ["CachedDataset", "DiskCache", "manifest_hash"]
+
+_META_FILE = "meta.json"
+_TMP_PREFIX = ".tmp-"
+
+
+def manifest_hash(paths: Sequence[str]) -> str:
+    """
+    This function hashes the manifest of a list of files, i.e. their path, size and modification time, so that a
+    modified, added or removed file changes the hash.
+
+    Args:
+        paths (list of str) : the paths of the files.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class CachedDataset:
+    """
+    A preprocessed dataset read back from the cache. Images are served as read-only views of memory-mapped shards.
+
+    Args:
+        path (str) : the directory of the cached dataset.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, _META_FILE), "r") as file:
+            self.meta = json.load(file)
+        self.shard_size: int = self.meta["shard_size"]
+        self.shards: List[np.ndarray] = [
+            np.load(os.path.join(path, name), mmap_mode="r")
+            for name in self.meta["shards"]
+        ]
+
+    def __len__(self) -> int:
+        return self.meta["length"]
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"index {index} is out of range")
+        return self.shards[index // self.shard_size][index % self.shard_size]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for shard in self.shards:
+            yield from shard
+
+
+class DiskCache:
+    """
+    A directory holding preprocessed datasets. Each dataset is written in a temporary directory renamed atomically
+    once complete, so that a crashed job never leaves a corrupt entry behind. When the cache exceeds `max_bytes`, the
+    least recently used datasets are evicted as a whole.
+
+    Args:
+        root (str) : the cache directory.
+        max_bytes (int, optional) : the size limit of the cache, unlimited if not given.
+        shard_size (int) : the number of images per shard.
+        num_workers (int, optional) : the number of threads used to fill the cache.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: Optional[int] = None,
+        shard_size: int = 1024,
+        num_workers: Optional[int] = None,
+    ) -> None:
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        self.shard_size = shard_size
+        self.num_workers = num_workers
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def _resolve(source: Union[str, Sequence[str]]) -> List[str]:
+        if isinstance(source, str):
+            return list(walk_images(source))
+        return list(source)
+
+    def key(
+        self,
+        source: Union[str, Sequence[str]],
+        preprocessors: Preprocessors,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> str:
+        """
+        This method returns the cache key of a dataset.
+
+        Args:
+            source (str or list of str) : the dataset directory or the list of its image paths.
+            preprocessors (BasePreprocessor or list) : the preprocessors applied to each image.
+            flags (int) : the OpenCV imread flags.
+        """
+        paths = self._resolve(source)
+        digest = hashlib.sha256()
+        digest.update(_as_pipeline(preprocessors).fingerprint().encode("utf-8"))
+        digest.update(f"\0flags={flags}\0".encode("utf-8"))
+        digest.update(manifest_hash(paths).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entries(self) -> Dict[str, float]:
+        """
+        This method returns the last access time of every complete dataset of the cache.
+        """
+        entries = {}
+        for entry in os.scandir(self.root):
+            meta = os.path.join(entry.path, _META_FILE)
+            if entry.is_dir() and not entry.name.startswith(_TMP_PREFIX):
+                try:
+                    entries[entry.name] = os.stat(meta).st_mtime
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def size(self) -> int:
+        """
+        This method returns the number of bytes used by the complete datasets of the cache.
+        """
+        return sum(
+            _directory_size(os.path.join(self.root, key)) for key in self._entries()
+        )
+
+    def get(
+        self,
+        source: Union[str, Sequence[str]],
+        preprocessors: Preprocessors,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> Optional[CachedDataset]:
+        """
+        This method returns a cached dataset or None if it is not in the cache.
+
+        Args:
+            source (str or list of str) : the dataset directory or the list of its image paths.
+            preprocessors (BasePreprocessor or list) : the preprocessors applied to each image.
+            flags (int) : the OpenCV imread flags.
+        """
+        return self._open(self.key(source, preprocessors, flags))
+
+    def _open(self, key: str) -> Optional[CachedDataset]:
+        path = os.path.join(self.root, key)
+        try:
+            # The modification time of the metadata file records the last access for the LRU eviction
+            os.utime(os.path.join(path, _META_FILE))
+        except FileNotFoundError:
+            return None
+        return CachedDataset(path)
+
+    def get_or_create(
+        self,
+        source: Union[str, Sequence[str]],
+        preprocessors: Preprocessors,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> CachedDataset:
+        """
+        This method returns a cached dataset, preprocessing and caching it first if needed.
+
+        Args:
+            source (str or list of str) : the dataset directory or the list of its image paths.
+            preprocessors (BasePreprocessor or list) : the preprocessors applied to each image, they must output a
+            single image shape.
+            flags (int) : the OpenCV imread flags.
+        """
+        paths = self._resolve(source)
+        if not paths:
+            raise ValueError("the dataset does not contain any image")
+        preprocessor = _as_pipeline(preprocessors)
+        key = self.key(paths, preprocessor, flags)
+        dataset = self._open(key)
+        if dataset is not None:
+            return dataset
+        tmp = os.path.join(self.root, f"{_TMP_PREFIX}{key}-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            self._write(tmp, paths, preprocessor, flags)
+            try:
+                os.rename(tmp, os.path.join(self.root, key))
+            except OSError:
+                # Another process cached the same dataset in the meantime
+                shutil.rmtree(tmp, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+        return self._open(key)
+
+    def _write(self, path: str, paths: Sequence[str], preprocessor, flags: int) -> None:
+        shards = []
+        shape = dtype = None
+        with ParallelExecutor(preprocessor, num_workers=self.num_workers) as executor:
+            for i, start in enumerate(range(0, len(paths), self.shard_size)):
+                chunk = paths[start : start + self.shard_size]
+                if shape is None:
+                    first = executor.map_paths(chunk[:1], flags=flags)
+                    shape, dtype = first.shape[1:], first.dtype
+                name = f"shard-{i:05d}.npy"
+                shard = np.lib.format.open_memmap(
+                    os.path.join(path, name),
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(len(chunk),) + shape,
+                )
+                executor.map_paths(chunk, out=shard, flags=flags)
+                shard.flush()
+                del shard
+                shards.append(name)
+        meta = {
+            "length": len(paths),
+            "shard_size": self.shard_size,
+            "shards": shards,
+            "shape": list(shape),
+            "dtype": str(dtype),
+            "config": preprocessor.get_config(),
+            "flags": flags,
+        }
+        with open(os.path.join(path, _META_FILE), "w") as file:
+            json.dump(meta, file, default=str)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def evict(self, keep: Optional[str] = None, stale_after: float = 24 * 3600) -> None:
+        """
+        This method removes the least recently used datasets until the cache fits into `max_bytes`, together with the
+        temporary directories left by crashed jobs.
+
+        Args:
+            keep (str, optional) : the key of a dataset that must not be evicted.
+            stale_after (float) : the age in seconds after which a temporary directory is considered abandoned.
+        """
+        now = time.time()
+        for entry in os.scandir(self.root):
+            if (
+                entry.name.startswith(_TMP_PREFIX)
+                and now - entry.stat().st_mtime > stale_after
+            ):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        if self.max_bytes is None:
+            return
+        entries = self._entries()
+        sizes = {key: _directory_size(os.path.join(self.root, key)) for key in entries}
+        total = sum(sizes.values())
+        for key in sorted(entries, key=entries.get):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= sizes[key]
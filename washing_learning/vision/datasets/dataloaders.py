@@ -0,0 +1,170 @@
+"""
+Implement the dataloaders used to stream image datasets larger than the memory through the preprocessors.
+
+Example:
+    >>> loader = ImageDataLoader("datasets/", [SimplePreprocessor(224, 224), SimpleScaler()], batch_size=64)
+    >>> for batch in loader:
+    >>>     ...
+"""
+# Standard libraries
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.parallel import Preprocessors, _as_pipeline
+from washing_learning.vision.preprocessing.preprocessors import BasePreprocessor
+
+__all__ = ["IMAGE_EXTENSIONS", "ImageDataLoader", "walk_images"]
+
+IMAGE_EXTENSIONS: Tuple[str, ...] = (
+    ".bmp",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".tif",
+    ".tiff",
+    ".webp",
+)
+
+
+def walk_images(
+    root: str, extensions: Sequence[str] = IMAGE_EXTENSIONS
+) -> Iterator[str]:
+    """
+    This function lazily yields the path of every image below `root`, in a deterministic order. Only the directory
+    being listed is held in memory, not the whole tree.
+
+    Args:
+        root (str) : the root directory of the dataset.
+        extensions (list of str) : the lowercase extensions of the files to yield.
+    """
+    with os.scandir(root) as iterator:
+        entries = sorted(iterator, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from walk_images(entry.path, extensions)
+        elif os.path.splitext(entry.name)[1].lower() in extensions:
+            yield entry.path
+
+
+def _batched(paths: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    This function groups an iterable of paths into lists of `batch_size` paths, the last one may be smaller.
+
+    Args:
+        paths (iterable of str) : the paths to group.
+        batch_size (int) : the number of paths of each group.
+    """
+    batch: List[str] = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_batch(
+    paths: Sequence[str], preprocessor: BasePreprocessor, flags: int
+) -> np.ndarray:
+    """
+    This function decodes and preprocesses a batch of images. It runs inside the worker processes.
+
+    Args:
+        paths (list of str) : the paths of the images of the batch.
+        preprocessor (BasePreprocessor) : the preprocessor applied to each image.
+        flags (int) : the OpenCV imread flags.
+    """
+    first = preprocessor.load(paths[0], flags)
+    batch = np.empty((len(paths),) + first.shape, dtype=first.dtype)
+    batch[0] = first
+    for i in range(1, len(paths)):
+        batch[i] = preprocessor.load(paths[i], flags)
+    return batch
+
+
+class ImageDataLoader:
+    """
+    Stream an image directory tree as fixed-size batches. The tree is walked lazily, images are decoded and
+    preprocessed in worker processes and at most `num_workers * prefetch` batches are in flight, so that the memory
+    used stays constant whatever the size of the dataset.
+
+    Args:
+        root (str) : the root directory of the dataset.
+        preprocessors (BasePreprocessor or list) : the preprocessors applied to each image, they must output a single
+        image shape.
+        batch_size (int) : the number of images per batch.
+        num_workers (int, optional) : the number of worker processes, defaults to the number of CPUs. 0 loads the
+        batches in the calling process.
+        prefetch (int) : the number of batches prepared in advance per worker.
+        extensions (list of str) : the lowercase extensions of the images to load.
+        flags (int) : the OpenCV imread flags.
+        drop_last (bool) : drop the last batch if it is smaller than `batch_size`.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        preprocessors: Preprocessors,
+        batch_size: int = 32,
+        num_workers: Optional[int] = None,
+        prefetch: int = 2,
+        extensions: Sequence[str] = IMAGE_EXTENSIONS,
+        flags: int = cv2.IMREAD_COLOR,
+        drop_last: bool = False,
+    ) -> None:
+        if not os.path.isdir(root):
+            raise NotADirectoryError(f"{root} is not a directory")
+        if batch_size < 1 or prefetch < 1:
+            raise ValueError("batch_size and prefetch must be positive")
+        self.root = root
+        self.preprocessor = _as_pipeline(preprocessors)
+        self.batch_size = batch_size
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.flags = flags
+        self.drop_last = drop_last
+
+    def paths(self) -> Iterator[str]:
+        """
+        This method lazily yields the path of every image of the dataset.
+        """
+        return walk_images(self.root, self.extensions)
+
+    def _batches_of_paths(self) -> Iterator[List[str]]:
+        for paths in _batched(self.paths(), self.batch_size):
+            if self.drop_last and len(paths) < self.batch_size:
+                return
+            yield paths
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        if self.num_workers == 0:
+            for paths in self._batches_of_paths():
+                yield _load_batch(paths, self.preprocessor, self.flags)
+            return
+        pending: Deque[Future] = deque()
+        max_pending = self.num_workers * self.prefetch
+        with ProcessPoolExecutor(max_workers=self.num_workers) as pool:
+            try:
+                for paths in self._batches_of_paths():
+                    pending.append(
+                        pool.submit(_load_batch, paths, self.preprocessor, self.flags)
+                    )
+                    if len(pending) >= max_pending:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # The consumer may stop early, pending batches are not needed anymore
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,249 @@
+"""
+Implement incremental preprocessing jobs, which only process the images added or modified since their last run.
+
+The job mirrors a dataset directory into an output directory of `.npy` files and keeps a manifest mapping every
+source file (path, size, modification time and optionally a content hash) to its output and to the fingerprint of
+the preprocessors and decoding flags. The manifest is an append-only log flushed after every chunk, an interrupted job
+thus resumes where it stopped, and it is compacted once the job completes.
+
+Example:
+    >>> job = IncrementalJob("datasets/", "preprocessed/", [SimplePreprocessor(224, 224), SimpleScaler()])
+    >>> job.run()
+    JobReport(processed=2000, skipped=1998000, removed=12)
+"""
+# Standard libraries
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets.dataloaders import IMAGE_EXTENSIONS, walk_images
+from washing_learning.vision.preprocessing.parallel import (
+    Preprocessors,
+    _as_pipeline,
+    limit_opencv_threads,
+)
+
+__all__ = ["IncrementalJob", "JobReport", "file_digest"]
+
+_MANIFEST_FILE = "manifest.jsonl"
+
+
+class JobReport(NamedTuple):
+    """
+    The number of images processed, skipped because up to date and removed because their source disappeared.
+    """
+
+    processed: int
+    skipped: int
+    removed: int
+
+
+def file_digest(path: str, chunk_size: int = 2**20) -> str:
+    """
+    This function returns the sha256 of the content of a file, read by chunks.
+
+    Args:
+        path (str) : the path of the file.
+        chunk_size (int) : the number of bytes read at once.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IncrementalJob:
+    """
+    A preprocessing job mirroring `source` into `output`, each image becoming a `.npy` file at the same relative path.
+    An image is processed again only if its size, its modification time, the preprocessors or the flags changed. With
+    `hash_content`, a changed size or time is confirmed by comparing the hash of the content, so that copied or
+    touched files are not processed again.
+
+    Args:
+        source (str) : the root directory of the dataset.
+        output (str) : the directory receiving the preprocessed images and the manifest.
+        preprocessors (BasePreprocessor or list) : the preprocessors applied to each image.
+        hash_content (bool) : record and compare the hash of the content of the images.
+        num_workers (int, optional) : the number of threads, defaults to the number of CPUs.
+        extensions (list of str) : the lowercase extensions of the images.
+        flags (int) : the OpenCV imread flags.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        output: str,
+        preprocessors: Preprocessors,
+        hash_content: bool = False,
+        num_workers: Optional[int] = None,
+        extensions: Sequence[str] = IMAGE_EXTENSIONS,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> None:
+        self.source = source
+        self.output = output
+        self.preprocessor = _as_pipeline(preprocessors)
+        self.hash_content = hash_content
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.flags = flags
+        # The same preprocessors output other images for other decoding flags, e.g. grayscale ones
+        self.config = hashlib.sha256(
+            f"{self.preprocessor.fingerprint()}\0flags={flags}".encode("utf-8")
+        ).hexdigest()
+        self.manifest_path = os.path.join(output, _MANIFEST_FILE)
+
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        This method returns the manifest, mapping the relative path of every processed image to its entry. Later
+        lines of the log override earlier ones, a line truncated by a crash is ignored.
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.manifest_path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("removed"):
+                        entries.pop(entry["path"], None)
+                    else:
+                        entries[entry["path"]] = entry
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _is_current(self, entry: Optional[Dict[str, Any]], path: str) -> bool:
+        """
+        This method tells whether the output recorded by an entry is still valid for the source file.
+
+        Args:
+            entry (dict, optional) : the manifest entry of the image.
+            path (str) : the path of the source file.
+        """
+        if entry is None or entry["config"] != self.config:
+            return False
+        stat = os.stat(path)
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        return self.hash_content and entry.get("hash") == file_digest(path)
+
+    def _process(self, relative: str) -> Dict[str, Any]:
+        """
+        This method preprocesses an image and writes its output atomically. It runs inside the worker threads.
+
+        Args:
+            relative (str) : the path of the image relative to the source directory.
+        """
+        path = os.path.join(self.source, relative)
+        stat = os.stat(path)
+        output = relative + ".npy"
+        target = os.path.join(self.output, output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.tmp-{uuid.uuid4().hex}.npy"
+        np.save(tmp, self.preprocessor.load(path, self.flags))
+        os.replace(tmp, target)
+        entry = {
+            "path": relative,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "output": output,
+            "config": self.config,
+        }
+        if self.hash_content:
+            entry["hash"] = file_digest(path)
+        return entry
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with open(self.manifest_path, "a") as file:
+            for entry in entries:
+                file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _compact(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as file:
+            for relative in sorted(entries):
+                file.write(json.dumps(entries[relative]) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def _scan(
+        self, entries: Dict[str, Dict[str, Any]]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """
+        This method walks the dataset and returns the relative paths of every image, the ones that are new or changed
+        and the entries of the unchanged ones whose size or time must be refreshed.
+
+        Args:
+            entries (dict) : the current manifest.
+        """
+        seen, pending, refreshed = [], [], []
+        for path in walk_images(self.source, self.extensions):
+            relative = os.path.relpath(path, self.source)
+            seen.append(relative)
+            entry = entries.get(relative)
+            if not self._is_current(entry, path):
+                pending.append(relative)
+                continue
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+                # Same content under a new size or time, only the entry is refreshed
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                refreshed.append(entry)
+        return seen, pending, refreshed
+
+    def pending(self) -> List[str]:
+        """
+        This method returns the relative path of every image that is new or changed since the last run.
+        """
+        return self._scan(self.manifest())[1]
+
+    def run(self, chunk_size: int = 256, prune: bool = True) -> JobReport:
+        """
+        This method processes the new and changed images, recording them in the manifest after every chunk.
+
+        Args:
+            chunk_size (int) : the number of images processed between two manifest updates.
+            prune (bool) : remove the outputs of the images whose source disappeared.
+        """
+        os.makedirs(self.output, exist_ok=True)
+        entries = self.manifest()
+        # Rewriting the log first drops a line truncated by a crash, new lines are then appended after a newline
+        self._compact(entries)
+        seen, pending, refreshed = self._scan(entries)
+        self._append(refreshed)
+        removed = 0
+        if prune:
+            for relative in sorted(set(entries) - set(seen)):
+                try:
+                    os.remove(os.path.join(self.output, entries[relative]["output"]))
+                except FileNotFoundError:
+                    pass
+                self._append([{"path": relative, "removed": True}])
+                del entries[relative]
+                removed += 1
+        with ThreadPoolExecutor(self.num_workers) as pool, limit_opencv_threads(1):
+            for start in range(0, len(pending), chunk_size):
+                done = list(
+                    pool.map(self._process, pending[start : start + chunk_size])
+                )
+                self._append(done)
+                entries.update((entry["path"], entry) for entry in done)
+        self._compact(entries)
+        return JobReport(len(pending), len(seen) - len(pending), removed)
@@ -0,0 +1,194 @@
+"""
+Implement a bounded in-memory cache of decoded and preprocessed images for multi-epoch training.
+
+The cache sits between the decoding and the consumer: wrapping the resizing preprocessors in a
+:class:`CachedPreprocessor` keeps their compact uint8 output in memory, so that epochs 2..N skip the decoding and
+the resizing. Scaling to float is better left after the cache, it would otherwise store 4 to 8 times more bytes.
+
+Example:
+    >>> cache = MemoryCache(max_bytes=8 * 2 ** 30)
+    >>> pipeline = Pipeline([CachedPreprocessor(SimplePreprocessor(224, 224), cache), SimpleScaler(dtype="float32")])
+    >>> with ParallelExecutor(pipeline) as executor:
+    >>>     for epoch in range(epochs):
+    >>>         batch = executor.map_paths(paths)
+    >>> cache.stats()
+    CacheStats(hits=..., misses=..., evictions=..., entries=..., bytes=...)
+"""
+# Standard libraries
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.parallel import Preprocessors, _as_pipeline
+from washing_learning.vision.preprocessing.preprocessors import BasePreprocessor
+
+__all__ = ["CacheStats", "CachedPreprocessor", "MemoryCache"]
+
+
+class CacheStats(NamedTuple):
+    """
+    A snapshot of the counters of a :class:`MemoryCache`.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class MemoryCache:
+    """
+    A thread-safe least recently used cache of arrays with a hard limit on the number of bytes it holds. Cached arrays
+    are made read-only, since they are shared by every consumer. The cache lives in the memory of its process, it is
+    shared by threads, i.e. it works with :class:`ParallelExecutor`, :class:`AsyncImageLoader`, :class:`Prefetcher`,
+    :class:`IncrementalJob` and an :class:`ImageDataLoader` with `num_workers=0`. It cannot be sent to worker
+    processes, e.g. the ones of an :class:`ImageDataLoader` with workers, and raises a TypeError when pickled.
+
+    Args:
+        max_bytes (int) : the maximum number of bytes of the cached arrays.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # A copy per worker process would silently never be hit across epochs, fail loudly instead
+        raise TypeError(
+            f"{type(self).__name__} cannot be sent to worker processes, use"
+            " num_workers=0 or a thread-based executor such as ParallelExecutor"
+            " instead"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """
+        This method returns the array cached under `key`, or None on a miss.
+
+        Args:
+            key (hashable) : the key of the array.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: np.ndarray) -> None:
+        """
+        This method caches an array, evicting the least recently used ones if needed. Arrays larger than the whole
+        cache are not cached.
+
+        Args:
+            key (hashable) : the key of the array.
+            value (arraylike) : the array to cache.
+        """
+        if value.nbytes > self.max_bytes:
+            return
+        value.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            while self._entries and self._bytes + value.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+            self._entries[key] = value
+            self._bytes += value.nbytes
+
+    def clear(self) -> None:
+        """
+        This method empties the cache, the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        """
+        This method returns the hit, miss and eviction counters and the current size of the cache.
+        """
+        with self._lock:
+            return CacheStats(
+                self._hits,
+                self._misses,
+                self._evictions,
+                len(self._entries),
+                self._bytes,
+            )
+
+
+class CachedPreprocessor(BasePreprocessor):
+    """
+    A preprocessor serving the images it loads from a :class:`MemoryCache`, keyed by their path and the fingerprint of
+    the wrapped preprocessors. Two threads missing the same image at once both load it, the cache stays consistent.
+    Like its cache, it is restricted to thread-based loaders, see :class:`MemoryCache`.
+
+    Args:
+        preprocessors (BasePreprocessor or list) : the preprocessors whose output is cached.
+        cache (MemoryCache) : the cache holding the preprocessed images.
+    """
+
+    def __init__(self, preprocessors: Preprocessors, cache: MemoryCache) -> None:
+        self.preprocessor = _as_pipeline(preprocessors)
+        self.cache = cache
+        self._fingerprint = self.preprocessor.fingerprint()
+
+    def get_config(self) -> Dict[str, Any]:
+        # The cache does not change the output, only the wrapped preprocessors define it
+        return self.preprocessor.get_config()
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        return self.preprocessor.output_shape(shape)
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        return self.preprocessor.output_dtype(dtype)
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        # In-memory images have no path to be cached under
+        return self.preprocessor.preprocess(image)
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        key = (path, flags, self._fingerprint)
+        image = self.cache.get(key)
+        if image is None:
+            image = self.preprocessor.load(path, flags)
+            self.cache.put(key, image)
+        return image
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        if path is None:
+            return self.preprocessor.load_bytes(data, flags)
+        key = (path, flags, self._fingerprint)
+        image = self.cache.get(key)
+        if image is None:
+            image = self.preprocessor.load_bytes(data, flags, path)
+            self.cache.put(key, image)
+        return image
@@ -0,0 +1,233 @@
+"""
+Implement a prefetching iterator preparing the next batches in a background thread while the current one is consumed.
+
+Any batch source can be wrapped, e.g. an :class:`ImageDataLoader` or a generator of raw batches. The batches are
+written into a fixed ring of `depth + 1` buffers allocated once, directly by a preprocessor's `preprocess_batch` when
+one is given, so that prefetching does not allocate memory on every batch. The buffers of a preprocessor come from its
+`allocate_batch`, e.g. pinned memory for a :class:`TensorConverter`. The stall time of the consumer tells whether the
+input pipeline is still the bottleneck of the training.
+
+Example:
+    >>> with Prefetcher(batches_of_images, depth=2, preprocessor=SimpleScaler(dtype="float32")) as batches:
+    >>>     for batch in batches:
+    >>>         train_step(batch)  # batch is valid until the next iteration
+    >>> batches.stats()
+    PrefetchStats(batches=1000, elapsed=..., stall_time=..., produce_time=..., blocked_time=...)
+"""
+# Standard libraries
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+# Third-party libraries
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import (
+    BasePreprocessor,
+    _batch_signature,
+)
+
+__all__ = ["PrefetchStats", "Prefetcher"]
+
+_END = object()
+
+
+class PrefetchStats(NamedTuple):
+    """
+    The timings of a :class:`Prefetcher`, in seconds. `stall_time` is the time the consumer waited for a batch,
+    `produce_time` the time the background thread spent producing batches and `blocked_time` the time it waited for
+    the consumer to free a buffer.
+    """
+
+    batches: int
+    elapsed: float
+    stall_time: float
+    produce_time: float
+    blocked_time: float
+
+    @property
+    def stall_fraction(self) -> float:
+        """
+        The fraction of the consumer time spent waiting for the input, close to 0 when the input keeps up.
+        """
+        return self.stall_time / self.elapsed if self.elapsed else 0.0
+
+
+class Prefetcher:
+    """
+    An iterator producing the batches of a source up to `depth` batches ahead in a background thread. A batch is a
+    view of one of the `depth + 1` reused buffers, it is recycled when the next batch is requested and must thus be
+    copied if it has to outlive the iteration.
+
+    Args:
+        source (iterable) : the batches, arrays or inputs of the preprocessor.
+        depth (int) : the number of batches prepared in advance.
+        preprocessor (BasePreprocessor, optional) : if given, each item of the source is preprocessed straight into a
+        buffer by its `preprocess_batch`, otherwise it is copied into a buffer.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        depth: int = 2,
+        preprocessor: Optional[BasePreprocessor] = None,
+    ) -> None:
+        if depth < 1:
+            raise ValueError(f"depth must be positive, got {depth}")
+        self.source = source
+        self.depth = depth
+        self.preprocessor = preprocessor
+        self._buffers: List[Optional[np.ndarray]] = [None] * (depth + 1)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(depth + 1):
+            self._free.put(slot)
+        self._ready: "queue.Queue[Any]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[int] = None
+        self._finished = False
+        self._started_at: Optional[float] = None
+        self._batches = 0
+        self._stall_time = 0.0
+        self._produce_time = 0.0
+        self._blocked_time = 0.0
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _buffer(
+        self,
+        slot: int,
+        shape: Tuple[int, ...],
+        dtype: np.dtype,
+        allocate: Callable[[], np.ndarray],
+    ) -> np.ndarray:
+        """
+        This method returns a contiguous view of the buffer of a slot fitting a batch, the buffer is only reallocated
+        if the batch does not fit into it, e.g. after a change of image shape.
+
+        Args:
+            slot (int) : the index of the buffer.
+            shape (tuple) : the shape of the batch.
+            dtype (dtype) : the dtype of the batch.
+            allocate (callable) : returns a new buffer of the shape and dtype of the batch.
+        """
+        buffer = self._buffers[slot]
+        if (
+            buffer is None
+            or buffer.shape[1:] != tuple(shape[1:])
+            or buffer.dtype != dtype
+            or len(buffer) < shape[0]
+        ):
+            buffer = self._buffers[slot] = allocate()
+        return buffer[: shape[0]]
+
+    def _write(self, slot: int, item: Any) -> np.ndarray:
+        if self.preprocessor is None:
+            item = np.asarray(item)
+            out = self._buffer(
+                slot,
+                item.shape,
+                item.dtype,
+                lambda: np.empty(item.shape, dtype=item.dtype),
+            )
+            np.copyto(out, item)
+            return out
+        shape, dtype = _batch_signature(item)
+        out = self._buffer(
+            slot,
+            (shape[0],) + tuple(self.preprocessor.output_shape(shape[1:])),
+            np.dtype(self.preprocessor.output_dtype(dtype)),
+            lambda: self.preprocessor.allocate_batch(item),
+        )
+        return self.preprocessor.preprocess_batch(item, out=out)
+
+    def _acquire(self) -> Optional[int]:
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _run(self) -> None:
+        """
+        This method produces the batches, it runs inside the background thread.
+        """
+        try:
+            iterator = iter(self.source)
+            while True:
+                start = time.perf_counter()
+                slot = self._acquire()
+                if slot is None:
+                    return
+                self._blocked_time += time.perf_counter() - start
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._ready.put(_END)
+                    return
+                batch = self._write(slot, item)
+                self._produce_time += time.perf_counter() - start
+                self._ready.put((slot, batch))
+        except BaseException as error:
+            # The error is raised in the consumer thread
+            self._ready.put(error)
+
+    def __iter__(self) -> "Prefetcher":
+        if self._thread is None:
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __next__(self) -> np.ndarray:
+        if self._thread is None:
+            iter(self)
+        if self._current is not None:
+            self._free.put(self._current)
+            self._current = None
+        if self._finished:
+            raise StopIteration
+        start = time.perf_counter()
+        item = self._ready.get()
+        self._stall_time += time.perf_counter() - start
+        if item is _END:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, BaseException):
+            self._finished = True
+            raise item
+        self._current, batch = item
+        self._batches += 1
+        return batch
+
+    def stats(self) -> PrefetchStats:
+        """
+        This method returns the number of batches consumed and the timings of the consumer and of the producer.
+        """
+        elapsed = (
+            0.0 if self._started_at is None else time.perf_counter() - self._started_at
+        )
+        return PrefetchStats(
+            self._batches,
+            elapsed,
+            self._stall_time,
+            self._produce_time,
+            self._blocked_time,
+        )
+
+    def close(self) -> None:
+        """
+        This method stops the background thread, the source is not consumed any further.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._finished = True
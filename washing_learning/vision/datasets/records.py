@@ -0,0 +1,280 @@
+"""
+Implement a sharded record format storing a whole image dataset in a few large files.
+
+Opening, stating and reading millions of small files costs more than decoding them. A record dataset appends the
+samples, either their encoded bytes or their preprocessed pixels, to large shard files and keeps a compact
+(shard, offset, length) index next to them. The shards are memory-mapped when read, so that a sample is a zero-copy
+view reached in O(1) from its id and a full pass is a sequential read of each shard.
+
+Example:
+    >>> write_records("datasets/", "records/", [SimplePreprocessor(224, 224)])
+    >>> with RecordReader("records/") as records:
+    >>>     image = records[42]
+    >>>     for image in records:
+    >>>         ...
+"""
+# Standard libraries
+import json
+import mmap
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.datasets.dataloaders import walk_images
+from washing_learning.vision.preprocessing.parallel import (
+    ParallelExecutor,
+    Preprocessors,
+    _as_pipeline,
+)
+
+__all__ = ["RecordReader", "RecordWriter", "write_records"]
+
+_INDEX_FILE = "index.npy"
+_META_FILE = "records.json"
+# Records start on a cache line, so that the pixels of preprocessed images are aligned for any dtype
+_ALIGNMENT = 64
+
+
+def _replace_atomically(path: str, write: Any) -> None:
+    """
+    This function writes a file through a temporary file renamed over it, readers never see a partial file.
+
+    Args:
+        path (str) : the path of the file.
+        write (callable) : writes the content into the given binary file object.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+class RecordWriter:
+    """
+    A writer appending records to shard files of a new record dataset. A record is either bytes, e.g. an encoded
+    image, or an array; the arrays of a dataset must share one shape and dtype. The index is written when the writer
+    is closed, a crashed job therefore leaves no readable dataset rather than a corrupt one.
+
+    Args:
+        path (str) : the directory of the dataset, it must not already hold one.
+        shard_bytes (int) : the size after which a new shard file is started.
+    """
+
+    def __init__(self, path: str, shard_bytes: int = 2**30) -> None:
+        self.path = path
+        self.shard_bytes = shard_bytes
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, _INDEX_FILE)):
+            raise FileExistsError(f"{path} already holds a record dataset")
+        self.shape: Optional[List[int]] = None
+        self.dtype: Optional[str] = None
+        self._shards: List[str] = []
+        self._index: List[List[int]] = []
+        self._file = None
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+
+    def _check_array(self, record: np.ndarray) -> None:
+        if self.dtype is None and not self._index:
+            self.shape, self.dtype = list(record.shape), record.dtype.str
+        elif self.dtype is None:
+            raise TypeError(
+                "arrays are not supported in a dataset of bytes, use bytes instead"
+            )
+        elif list(record.shape) != self.shape or record.dtype.str != self.dtype:
+            raise ValueError(
+                f"the record of shape {record.shape} and dtype {record.dtype} does not"
+                f" match the dataset ({tuple(self.shape)}, {np.dtype(self.dtype)})"
+            )
+
+    def write(self, record: Union[bytes, np.ndarray]) -> int:
+        """
+        This method appends a record to the current shard and returns its id.
+
+        Args:
+            record (bytes or arraylike) : the encoded bytes or the array of the sample.
+        """
+        if isinstance(record, np.ndarray):
+            self._check_array(record)
+            data = memoryview(np.ascontiguousarray(record)).cast("B")
+        else:
+            if self.dtype is not None:
+                raise TypeError(
+                    "bytes are not supported in a dataset of arrays, use arrays instead"
+                )
+            data = memoryview(record).cast("B")
+        if self._file is None or self._offset >= self.shard_bytes:
+            self._next_shard()
+        padding = -self._offset % _ALIGNMENT
+        if padding:
+            self._file.write(b"\0" * padding)
+            self._offset += padding
+        self._file.write(data)
+        self._index.append([len(self._shards) - 1, self._offset, data.nbytes])
+        self._offset += data.nbytes
+        return len(self._index) - 1
+
+    def _next_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        name = f"shard-{len(self._shards):05d}.bin"
+        self._file = open(os.path.join(self.path, name), "wb")
+        self._shards.append(name)
+        self._offset = 0
+
+    def close(self) -> None:
+        """
+        This method flushes the last shard, then writes the index and the metadata of the dataset.
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+        index = np.array(self._index, dtype=np.int64).reshape(-1, 3)
+        meta = {
+            "length": len(self._index),
+            "shards": self._shards,
+            "shape": self.shape,
+            "dtype": self.dtype,
+        }
+        _replace_atomically(
+            os.path.join(self.path, _META_FILE),
+            lambda file: file.write(json.dumps(meta).encode("utf-8")),
+        )
+        # The index is written last, its presence marks a complete dataset
+        _replace_atomically(
+            os.path.join(self.path, _INDEX_FILE), lambda file: np.save(file, index)
+        )
+
+
+class RecordReader:
+    """
+    A reader of a record dataset. Records are served as read-only views of the memory-mapped shards: arrays for a
+    dataset of arrays, uint8 buffers for a dataset of bytes, which :meth:`decode` turns into images.
+
+    Args:
+        path (str) : the directory of the dataset.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index: np.ndarray = np.load(os.path.join(path, _INDEX_FILE))
+        with open(os.path.join(path, _META_FILE), "r") as file:
+            self.meta: Dict[str, Any] = json.load(file)
+        self.shape = None if self.meta["shape"] is None else tuple(self.meta["shape"])
+        self.dtype = np.dtype(self.meta["dtype"] or np.uint8)
+        self._maps: List[mmap.mmap] = []
+        for name in self.meta["shards"]:
+            with open(os.path.join(path, name), "rb") as file:
+                self._maps.append(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __enter__(self) -> "RecordReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        shard, offset, length = self.index[index]
+        record = np.frombuffer(
+            self._maps[shard],
+            dtype=self.dtype,
+            count=length // self.dtype.itemsize,
+            offset=offset,
+        )
+        return record if self.shape is None else record.reshape(self.shape)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        # Records are stored in id order, iterating them reads every shard sequentially
+        for index in range(len(self)):
+            yield self[index]
+
+    def decode(self, index: int, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """
+        This method decodes the encoded image stored in a record.
+
+        Args:
+            index (int) : the id of the record.
+            flags (int) : the OpenCV imdecode flags.
+        """
+        if self.shape is not None:
+            raise TypeError(
+                "decoding is not supported for a dataset of arrays, index it instead"
+            )
+        image = cv2.imdecode(self[index], flags)
+        if image is None:
+            raise IOError(f"record {index} could not be decoded")
+        return image
+
+    def close(self) -> None:
+        """
+        This method unmaps the shards. Views of the records must not be used afterwards.
+        """
+        for shard in self._maps:
+            try:
+                shard.close()
+            except BufferError:
+                # A record view is still alive, the mapping is released with it
+                pass
+        self._maps = []
+
+
+def write_records(
+    source: Union[str, Sequence[str]],
+    path: str,
+    preprocessors: Optional[Preprocessors] = None,
+    flags: int = cv2.IMREAD_COLOR,
+    shard_bytes: int = 2**30,
+    chunk_size: int = 1024,
+    num_workers: Optional[int] = None,
+) -> RecordReader:
+    """
+    This function converts a directory of images into a record dataset, in the sorted order of :func:`walk_images`.
+    Without preprocessors the encoded files are copied as is, which keeps the dataset small; with preprocessors, the
+    images are decoded and preprocessed in parallel and their pixels are stored, which skips both steps when reading.
+
+    Args:
+        source (str or list of str) : the dataset directory or the list of its image paths.
+        path (str) : the directory of the record dataset.
+        preprocessors (BasePreprocessor or list, optional) : the preprocessors applied to each image, they must
+        output a single image shape.
+        flags (int) : the OpenCV imread flags.
+        shard_bytes (int) : the size after which a new shard file is started.
+        chunk_size (int) : the number of images preprocessed at once.
+        num_workers (int, optional) : the number of preprocessing threads.
+    """
+    paths = list(walk_images(source)) if isinstance(source, str) else list(source)
+    with RecordWriter(path, shard_bytes) as writer:
+        if preprocessors is None:
+            for image_path in paths:
+                with open(image_path, "rb") as file:
+                    writer.write(file.read())
+        else:
+            preprocessor = _as_pipeline(preprocessors)
+            with ParallelExecutor(preprocessor, num_workers=num_workers) as executor:
+                for start in range(0, len(paths), chunk_size):
+                    chunk = paths[start : start + chunk_size]
+                    for image in executor.map_paths(chunk, flags=flags):
+                        writer.write(image)
+    return RecordReader(path)
@@ -0,0 +1,178 @@
+"""
+Implement a batch sampler grouping images of similar aspect ratio, so that each batch shares a single target size.
+
+Resizing every image to one fixed (width, height) distorts or pads the ones whose shape differs the most, typically
+portrait images in a mostly landscape dataset. :class:`AspectRatioBucketSampler` reads the size of every image from
+its header only, assigns it to the bucket of closest aspect ratio and only forms batches within a bucket. The padding
+needed to letterbox the images into their target size can be compared to a fixed size with :meth:`padding_waste`.
+
+Example:
+    >>> sampler = AspectRatioBucketSampler(walk_images("datasets/"), batch_size=32, rng=np.random.default_rng(0))
+    >>> sampler.padding_waste(), sampler.padding_waste(224, 224)
+    (0.03, 0.19)
+    >>> for batch in sampler:
+    >>>     images = [AspectAwarePreprocessor(batch.width, batch.height).load(path) for path in batch.paths]
+"""
+# Standard libraries
+import math
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Third-party libraries
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.decoding import imread, read_image_header
+
+__all__ = ["AspectRatioBucketSampler", "BucketBatch", "make_buckets"]
+
+
+class BucketBatch(NamedTuple):
+    """
+    A batch of images sharing the (width, height) target size of their bucket.
+    """
+
+    width: int
+    height: int
+    paths: List[str]
+
+
+def make_buckets(
+    size: int = 224, max_ratio: float = 2.0, step: int = 32
+) -> List[Tuple[int, int]]:
+    """
+    This function returns (width, height) target sizes of about `size * size` pixels, with sides multiple of `step`
+    and aspect ratios between 1 / max_ratio and max_ratio, sorted by aspect ratio.
+
+    Args:
+        size (int) : the side of the square bucket, the other buckets keep about the same area.
+        max_ratio (float) : the largest width / height or height / width ratio.
+        step (int) : the multiple every side is rounded to, e.g. the total stride of the network.
+    """
+    buckets = set()
+    for width in range(step, int(size * math.sqrt(max_ratio)) + step, step):
+        height = max(step, int(round(size * size / width / step)) * step)
+        if 1 / max_ratio <= width / height <= max_ratio:
+            buckets.add((width, height))
+            buckets.add((height, width))
+    return sorted(buckets, key=lambda bucket: bucket[0] / bucket[1])
+
+
+def _image_size(path: str) -> Tuple[int, int]:
+    header = read_image_header(path)
+    if header is None:
+        # Formats without a supported header are decoded once
+        height, width = imread(path).shape[:2]
+        return width, height
+    return header[1], header[2]
+
+
+def _letterbox_waste(sizes: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    This function returns the fraction of each target left as padding once its image is resized to fit inside it
+    without distortion.
+
+    Args:
+        sizes (arraylike) : the (N, 2) (width, height) of the images.
+        targets (arraylike) : the (N, 2) (width, height) of their targets.
+    """
+    scale = np.minimum(targets[:, 0] / sizes[:, 0], targets[:, 1] / sizes[:, 1])
+    used = sizes[:, 0] * sizes[:, 1] * scale**2
+    return 1.0 - used / (targets[:, 0] * targets[:, 1])
+
+
+class AspectRatioBucketSampler:
+    """
+    A sampler yielding :class:`BucketBatch` batches of images assigned to the bucket of closest aspect ratio, in the
+    log space so that 2:1 and 1:2 are equally far from 1:1. Batches are shuffled within and across buckets on every
+    epoch when a generator is given.
+
+    Args:
+        paths (iterable of str) : the paths of the images.
+        batch_size (int) : the number of images per batch.
+        buckets (list of tuple, optional) : the (width, height) target sizes, :func:`make_buckets` by default.
+        drop_last (bool) : drop the last incomplete batch of every bucket.
+        rng (np.random.Generator, optional) : the generator shuffling the batches, None keeps the order of the paths.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        batch_size: int,
+        buckets: Optional[Sequence[Tuple[int, int]]] = None,
+        drop_last: bool = False,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.buckets = list(make_buckets() if buckets is None else buckets)
+        self.drop_last = drop_last
+        self.rng = rng
+        self.sizes = np.array(
+            [_image_size(path) for path in self.paths], dtype=np.float64
+        ).reshape(-1, 2)
+        targets = np.array(self.buckets, dtype=np.float64)
+        distances = np.abs(
+            np.log(self.sizes[:, 0:1] / self.sizes[:, 1:2])
+            - np.log(targets[:, 0] / targets[:, 1])
+        )
+        self.assignments = np.argmin(distances, axis=1)
+
+    def bucket_counts(self) -> List[int]:
+        """
+        This method returns the number of images assigned to each bucket.
+        """
+        return np.bincount(self.assignments, minlength=len(self.buckets)).tolist()
+
+    def _batches(self) -> List[Tuple[int, np.ndarray]]:
+        batches = []
+        for bucket in range(len(self.buckets)):
+            members = np.flatnonzero(self.assignments == bucket)
+            if self.rng is not None:
+                members = self.rng.permutation(members)
+            for start in range(0, len(members), self.batch_size):
+                chunk = members[start : start + self.batch_size]
+                if self.drop_last and len(chunk) < self.batch_size:
+                    continue
+                batches.append((bucket, chunk))
+        return batches
+
+    def __len__(self) -> int:
+        counts = np.bincount(self.assignments, minlength=len(self.buckets))
+        if self.drop_last:
+            return int(np.sum(counts // self.batch_size))
+        return int(np.sum(-(-counts // self.batch_size)))
+
+    def __iter__(self) -> Iterator[BucketBatch]:
+        batches = self._batches()
+        order = (
+            range(len(batches))
+            if self.rng is None
+            else self.rng.permutation(len(batches))
+        )
+        for i in order:
+            bucket, members = batches[i]
+            width, height = self.buckets[bucket]
+            yield BucketBatch(width, height, [self.paths[j] for j in members])
+
+    def padding_waste(
+        self, width: Optional[int] = None, height: Optional[int] = None
+    ) -> float:
+        """
+        This method returns the mean fraction of the target pixels left as padding when every image is letterboxed
+        into its bucket, or into a single (width, height) target if given, to quantify the gain of the buckets.
+
+        Args:
+            width (int, optional) : the width of a fixed target size to compare with.
+            height (int, optional) : the height of a fixed target size to compare with.
+        """
+        if not len(self.sizes):
+            return 0.0
+        if width is None or height is None:
+            targets = np.array(self.buckets, dtype=np.float64)[self.assignments]
+        else:
+            targets = np.tile(
+                np.array([width, height], dtype=np.float64), (len(self.sizes), 1)
+            )
+        return float(np.mean(_letterbox_waste(self.sizes, targets)))
@@ -0,0 +1,265 @@
+"""
+Implement a work queue spreading a preprocessing job over any number of processes, on one host or many, sharing
+nothing but a filesystem.
+
+The queue is a directory of chunk files, each listing the paths of a few images. A worker claims a chunk by renaming
+it from `todo/` to `claimed/`, which only one worker can do since a rename is atomic, processes it into a `.npy`
+shard and renames it into `done/`. While working, the worker refreshes the modification time of its claim: claims
+left untouched for `stale_after` seconds belong to crashed workers and are put back into `todo/`.
+
+Example:
+    >>> queue = WorkQueue("/shared/queue")
+    >>> queue.fill(walk_images("/shared/datasets"), chunk_size=512)
+    >>> # then, in as many processes as wanted, on any host mounting /shared
+    >>> run_worker("/shared/queue", "/shared/preprocessed", [SimplePreprocessor(224, 224)])
+"""
+# Standard libraries
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Iterable, List, NamedTuple, Optional
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.parallel import Preprocessors, _as_pipeline
+
+__all__ = ["Claim", "QueueStatus", "WorkQueue", "run_worker"]
+
+_TODO, _CLAIMED, _DONE = "todo", "claimed", "done"
+# Separates the name of a chunk from the id of the worker claiming it
+_OWNER_SEPARATOR = "@"
+
+
+class Claim(NamedTuple):
+    """
+    A chunk claimed by a worker, `path` is its file in the `claimed/` directory.
+    """
+
+    name: str
+    path: str
+    paths: List[str]
+
+
+class QueueStatus(NamedTuple):
+    """
+    The number of chunks waiting, being processed and done.
+    """
+
+    todo: int
+    claimed: int
+    done: int
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class WorkQueue:
+    """
+    A queue of chunks of image paths stored in a directory. Every state change is a rename, so that the queue stays
+    consistent whatever the number of processes and their crashes. The staleness of a claim is measured against the
+    local clock, the clocks of the hosts must therefore agree within a small fraction of `stale_after`.
+
+    Args:
+        root (str) : the directory of the queue.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        for state in (_TODO, _CLAIMED, _DONE):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+
+    def _list(self, state: str) -> List[str]:
+        return sorted(os.listdir(os.path.join(self.root, state)))
+
+    def fill(self, paths: Iterable[str], chunk_size: int = 256) -> int:
+        """
+        This method splits a list of image paths into chunks added to the queue and returns the number of chunks.
+        Each chunk is written under a temporary name then renamed, workers never see a partial chunk.
+
+        Args:
+            paths (iterable of str) : the paths of the images.
+            chunk_size (int) : the number of images per chunk.
+        """
+        if any(self.status()):
+            raise FileExistsError(f"{self.root} already holds a queue")
+        paths = list(paths)
+        count = 0
+        for start in range(0, len(paths), chunk_size):
+            name = f"chunk-{count:06d}.json"
+            target = os.path.join(self.root, _TODO, name)
+            tmp = os.path.join(self.root, f".{name}.tmp")
+            with open(tmp, "w") as file:
+                json.dump(paths[start : start + chunk_size], file)
+            os.replace(tmp, target)
+            count += 1
+        return count
+
+    def status(self) -> QueueStatus:
+        """
+        This method returns the number of chunks in each state.
+        """
+        return QueueStatus(
+            *(len(self._list(state)) for state in (_TODO, _CLAIMED, _DONE))
+        )
+
+    def claim(self, worker_id: str) -> Optional[Claim]:
+        """
+        This method claims the first available chunk, or returns None if no chunk is waiting.
+
+        Args:
+            worker_id (str) : a unique id of the worker, recorded in the name of the claim.
+        """
+        for name in self._list(_TODO):
+            source = os.path.join(self.root, _TODO, name)
+            path = os.path.join(
+                self.root, _CLAIMED, f"{name}{_OWNER_SEPARATOR}{worker_id}"
+            )
+            try:
+                # The rename keeps the modification time, refreshing it first keeps the new claim from looking stale
+                os.utime(source)
+                os.rename(source, path)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            try:
+                os.utime(path)
+                with open(path, "r") as file:
+                    return Claim(name, path, json.load(file))
+            except FileNotFoundError:
+                # Recovered as stale by another worker in the meantime, e.g. with a skewed clock
+                continue
+        return None
+
+    @staticmethod
+    def heartbeat(claim: Claim) -> bool:
+        """
+        This method tells the other workers that a claim is still being processed. It returns False if the claim was
+        recovered as stale in the meantime, the chunk then belongs to the queue again.
+
+        Args:
+            claim (Claim) : the claim being processed.
+        """
+        try:
+            os.utime(claim.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, claim: Claim) -> None:
+        """
+        This method marks a claimed chunk as done.
+
+        Args:
+            claim (Claim) : the claim processed.
+        """
+        try:
+            os.rename(claim.path, os.path.join(self.root, _DONE, claim.name))
+        except FileNotFoundError:
+            # The claim was recovered as stale, the chunk will be processed again into the same output
+            pass
+
+    def release(self, claim: Claim) -> None:
+        """
+        This method puts a claimed chunk back into the queue, e.g. after a failure.
+
+        Args:
+            claim (Claim) : the claim to give up.
+        """
+        try:
+            os.rename(claim.path, os.path.join(self.root, _TODO, claim.name))
+        except FileNotFoundError:
+            # The claim was already recovered as stale
+            pass
+
+    def recover(self, stale_after: float) -> int:
+        """
+        This method puts back into the queue the claims not refreshed for `stale_after` seconds and returns their
+        number.
+
+        Args:
+            stale_after (float) : the age in seconds after which a claim is considered abandoned.
+        """
+        recovered = 0
+        now = time.time()
+        for claimed in self._list(_CLAIMED):
+            path = os.path.join(self.root, _CLAIMED, claimed)
+            name = claimed.split(_OWNER_SEPARATOR, 1)[0]
+            try:
+                if now - os.stat(path).st_mtime <= stale_after:
+                    continue
+                os.rename(path, os.path.join(self.root, _TODO, name))
+            except FileNotFoundError:
+                # Completed or recovered by another worker in the meantime
+                continue
+            recovered += 1
+        return recovered
+
+
+def run_worker(
+    queue: str,
+    output: str,
+    preprocessors: Preprocessors,
+    stale_after: float = 600.0,
+    poll: float = 1.0,
+    flags: int = cv2.IMREAD_COLOR,
+    worker_id: Optional[str] = None,
+) -> int:
+    """
+    This function processes chunks of a queue until every chunk is done and returns the number of chunks it processed.
+    Each chunk becomes a `<chunk>.npy` shard of `output`, written under a temporary name then renamed. While other
+    workers hold the last claims, the worker waits and takes over the ones becoming stale.
+
+    Args:
+        queue (str) : the directory of the queue.
+        output (str) : the directory receiving the shards.
+        preprocessors (BasePreprocessor or list) : the preprocessors applied to each image, they must output a single
+        image shape.
+        stale_after (float) : the age in seconds after which a claim is considered abandoned. It must be much longer
+        than the processing of one image.
+        poll (float) : the number of seconds to wait when every remaining chunk is claimed.
+        flags (int) : the OpenCV imread flags.
+        worker_id (str, optional) : a unique id of the worker, derived from the host and the process by default.
+    """
+    work_queue = WorkQueue(queue)
+    preprocessor = _as_pipeline(preprocessors)
+    worker_id = worker_id or _worker_id()
+    os.makedirs(output, exist_ok=True)
+    processed = 0
+    while True:
+        work_queue.recover(stale_after)
+        claim = work_queue.claim(worker_id)
+        if claim is None:
+            status = work_queue.status()
+            # A chunk released or recovered between the claim and the status is still to be done
+            if status.todo == 0 and status.claimed == 0:
+                return processed
+            time.sleep(poll)
+            continue
+        try:
+            shard = None
+            for i, path in enumerate(claim.paths):
+                image = preprocessor.load(path, flags)
+                if shard is None:
+                    shard = np.empty(
+                        (len(claim.paths),) + image.shape, dtype=image.dtype
+                    )
+                shard[i] = image
+                if not work_queue.heartbeat(claim):
+                    # The claim was recovered as stale, another worker processes the chunk
+                    break
+            else:
+                stem = os.path.splitext(claim.name)[0]
+                tmp = os.path.join(output, f".{stem}-{worker_id}.tmp.npy")
+                np.save(tmp, shard)
+                os.replace(tmp, os.path.join(output, f"{stem}.npy"))
+                work_queue.complete(claim)
+                processed += 1
+        except BaseException:
+            work_queue.release(claim)
+            raise
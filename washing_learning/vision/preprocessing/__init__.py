@@ -0,0 +1,44 @@
+"""
+Every image preprocessor shares the :class:`BasePreprocessor` interface and can therefore be used one image at a time
+or on a whole batch.
+"""
+
+from washing_learning._lazy import attach
+
+# The torch-based tensors submodule is not part of __all__, a star import must not load torch
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["tensors"],
+    attributes={
+        "augmentation": [
+            "BrightnessContrastJitter",
+            "RandomCrop",
+            "RandomFlip",
+            "spawn_generators",
+        ],
+        "decoding": [
+            "imdecode",
+            "imread",
+            "imread_resized",
+            "read_image_header",
+            "reduced_decoding_flags",
+            "reduced_imread_flags",
+        ],
+        "parallel": ["ParallelExecutor", "benchmark_scaling", "limit_opencv_threads"],
+        "pipeline": ["Pipeline"],
+        "preprocessors": [
+            "AspectAwarePreprocessor",
+            "BasePreprocessor",
+            "ChannelsFirstConverter",
+            "Normalizer",
+            "PatchPreprocessor",
+            "PyramidPreprocessor",
+            "SimplePreprocessor",
+            "SimpleScaler",
+        ],
+        "quantization": ["QuantizedBatch"],
+        "statistics": ["RunningStatistics", "compute_statistics"],
+        "tiled": ["open_image_array", "tiled_apply", "tiled_resize"],
+        "transport": ["SharedBatchRing", "fill_ring"],
+    },
+)
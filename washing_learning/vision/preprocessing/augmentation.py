@@ -0,0 +1,225 @@
+"""
+Implement data augmentation preprocessors working on a whole (N, H, W, C) batch at once.
+
+Random parameters are drawn for the whole batch in a single call, flips are done with index tricks, crops are
+gathered from precomputed offsets and photometric jitter is broadcast arithmetic, no Python loop runs per image.
+Each augmentation draws from an explicit `np.random.Generator`, use :func:`spawn_generators` to give every parallel
+worker its own independent and reproducible stream.
+
+Example:
+    >>> rng = spawn_generators(seed=42, count=1)[0]
+    >>> augmentations = [RandomFlip(rng=rng), RandomCrop(224, 224, rng=rng), BrightnessContrastJitter(rng=rng)]
+    >>> for augmentation in augmentations:
+    >>>     batch = augmentation.preprocess_batch(batch)
+"""
+# Standard libraries
+from typing import List, Optional, Tuple
+
+# Third-party libraries
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import (
+    BasePreprocessor,
+    Images,
+    _check_output,
+)
+
+__all__ = [
+    "BrightnessContrastJitter",
+    "RandomCrop",
+    "RandomFlip",
+    "spawn_generators",
+]
+
+
+def spawn_generators(seed: Optional[int], count: int) -> List[np.random.Generator]:
+    """
+    This function returns `count` statistically independent generators derived from a single seed, typically one per
+    worker, so that the augmentations are reproducible whatever the number of workers.
+
+    Args:
+        seed (int, optional) : the root seed, None draws it from the OS entropy.
+        count (int) : the number of generators.
+    """
+    return [
+        np.random.default_rng(child)
+        for child in np.random.SeedSequence(seed).spawn(count)
+    ]
+
+
+def _max_value(dtype: np.dtype) -> float:
+    """
+    This function returns the value of a white pixel for a given dtype, 1 for floating images.
+
+    Args:
+        dtype (dtype) : the dtype of the images.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "ui":
+        return float(np.iinfo(dtype).max)
+    return 1.0
+
+
+class _BatchAugmentation(BasePreprocessor):
+    """
+    The base class of the augmentations, a single image is augmented as a batch of one.
+    """
+
+    def __init__(self, rng: Optional[np.random.Generator] = None) -> None:
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        return self.preprocess_batch(image[np.newaxis])[0]
+
+    def _prepare(
+        self, images: Images, out: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        images = np.asarray(images)
+        expected_shape = (images.shape[0],) + self.output_shape(images.shape[1:])
+        if out is None:
+            out = np.empty(expected_shape, dtype=self.output_dtype(images.dtype))
+        else:
+            _check_output(out, expected_shape, self.output_dtype(images.dtype))
+        return images, out
+
+
+class RandomFlip(_BatchAugmentation):
+    """
+    An augmentation flipping each image of a batch with a given probability. It can run in-place with `out=images`.
+
+    Args:
+        horizontal (bool) : Flip the images horizontally.
+        vertical (bool) : Flip the images vertically.
+        p (float) : The probability of each flip.
+        rng (np.random.Generator, optional) : The random generator drawing the flips.
+    """
+
+    def __init__(
+        self,
+        horizontal: bool = True,
+        vertical: bool = False,
+        p: float = 0.5,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        super(RandomFlip, self).__init__(rng)
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.p = p
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        images, out = self._prepare(images, out)
+        if out is not images:
+            np.copyto(out, images)
+        for axis, enabled in ((2, self.horizontal), (1, self.vertical)):
+            if not enabled:
+                continue
+            flipped = np.flatnonzero(self.rng.random(len(out)) < self.p)
+            if flipped.size:
+                # Gathering the selected images is a copy, the assignment can thus safely overlap
+                out[flipped] = np.flip(out[flipped], axis=axis)
+        return out
+
+
+class RandomCrop(_BatchAugmentation):
+    """
+    An augmentation cropping each image of a batch at a random position. The offsets are drawn for the whole batch
+    and the crops are gathered with a single fancy indexing.
+
+    Args:
+        width (int) : The width of the crops.
+        height (int) : The height of the crops.
+        rng (np.random.Generator, optional) : The random generator drawing the offsets.
+    """
+
+    def __init__(
+        self, width: int, height: int, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super(RandomCrop, self).__init__(rng)
+        self.width = width
+        self.height = height
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        if shape[0] < self.height or shape[1] < self.width:
+            raise ValueError(
+                f"the images of shape {shape} are smaller than the crops"
+                f" ({self.height}, {self.width})"
+            )
+        return (self.height, self.width) + tuple(shape[2:])
+
+    def offsets(
+        self, count: int, shape: Tuple[int, ...]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method draws the (top, left) offsets of `count` crops in images of a given shape.
+
+        Args:
+            count (int) : the number of crops.
+            shape (tuple) : the (H, W) or (H, W, C) shape of the images.
+        """
+        top = self.rng.integers(0, shape[0] - self.height + 1, size=count)
+        left = self.rng.integers(0, shape[1] - self.width + 1, size=count)
+        return top, left
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        images, out = self._prepare(images, out)
+        top, left = self.offsets(len(images), images.shape[1:])
+        rows = top[:, np.newaxis] + np.arange(self.height)
+        cols = left[:, np.newaxis] + np.arange(self.width)
+        out[...] = images[
+            np.arange(len(images))[:, np.newaxis, np.newaxis],
+            rows[:, :, np.newaxis],
+            cols[:, np.newaxis, :],
+        ]
+        return out
+
+
+class BrightnessContrastJitter(_BatchAugmentation):
+    """
+    An augmentation changing the brightness and the contrast of each image of a batch, i.e.
+    `image * contrast + brightness` with both factors drawn per image and broadcast over the batch.
+
+    Args:
+        brightness (float) : The brightness shift is drawn in [-brightness, brightness], as a fraction of the white
+        value (255 for uint8 images, 1 for floating images).
+        contrast (float) : The contrast gain is drawn in [1 - contrast, 1 + contrast].
+        rng (np.random.Generator, optional) : The random generator drawing the factors.
+    """
+
+    def __init__(
+        self,
+        brightness: float = 0.2,
+        contrast: float = 0.2,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        super(BrightnessContrastJitter, self).__init__(rng)
+        self.brightness = brightness
+        self.contrast = contrast
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        images, out = self._prepare(images, out)
+        count = len(images)
+        broadcast = (count,) + (1,) * (images.ndim - 1)
+        white = _max_value(images.dtype)
+        gain = self.rng.uniform(1 - self.contrast, 1 + self.contrast, count)
+        shift = self.rng.uniform(-self.brightness, self.brightness, count) * white
+        if images.dtype.kind == "f":
+            np.multiply(images, gain.astype(images.dtype).reshape(broadcast), out=out)
+            out += shift.astype(images.dtype).reshape(broadcast)
+            np.clip(out, 0, white, out=out)
+            return out
+        # Integer images are jittered in float32 then rounded back
+        jittered = np.multiply(
+            images, gain.astype(np.float32).reshape(broadcast), dtype=np.float32
+        )
+        jittered += shift.astype(np.float32).reshape(broadcast)
+        np.clip(jittered, 0, white, out=jittered)
+        np.rint(jittered, out=jittered)
+        np.copyto(out, jittered, casting="unsafe")
+        return out
@@ -0,0 +1,257 @@
+"""
+Implement the image decoding helpers shared by the preprocessors and the dataloaders.
+
+When the target size is much smaller than the source, decoding the full-resolution image only to downscale it right
+after is a waste. JPEG images can be decoded directly at 1/2, 1/4 or 1/8 of their resolution, which OpenCV exposes
+through its `IMREAD_REDUCED_*` flags, :func:`imread_resized` picks the smallest of them still larger than the target.
+
+Example:
+    >>> image = imread_resized("camera.jpg", 224, 224)  # a 4000x3000 JPEG is decoded at 500x375 then resized
+"""
+# Standard libraries
+import os
+import struct
+from typing import BinaryIO, Optional, Tuple, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+__all__ = [
+    "imdecode",
+    "imread",
+    "imread_resized",
+    "read_image_header",
+    "reduced_decoding_flags",
+    "reduced_imread_flags",
+]
+
+_REDUCED_FLAGS = {
+    cv2.IMREAD_COLOR: {
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    },
+    cv2.IMREAD_GRAYSCALE: {
+        2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    },
+}
+
+# Start Of Frame markers holding the dimensions of a JPEG image
+_JPEG_SOF_MARKERS = {
+    0xC0,
+    0xC1,
+    0xC2,
+    0xC3,
+    0xC5,
+    0xC6,
+    0xC7,
+    0xC9,
+    0xCA,
+    0xCB,
+    0xCD,
+    0xCE,
+    0xCF,
+}
+# The APP1 segment holding the EXIF metadata, whose orientation tag OpenCV applies while decoding
+_JPEG_APP1 = 0xE1
+_EXIF_ORIENTATION_TAG = 0x0112
+_EXIF_SHORT = 3
+# The orientations swapping the width and the height of the image, i.e. rotated by 90 degrees
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def imread(path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """
+    This function reads an image and raises an error instead of returning None when it cannot be decoded.
+
+    Args:
+        path (str) : the path of the image.
+        flags (int) : the OpenCV imread flags.
+    """
+    image = cv2.imread(path, flags)
+    if image is None:
+        raise IOError(f"{path} could not be read as an image")
+    return image
+
+
+def imdecode(data: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """
+    This function decodes the content of an image file and raises an error instead of returning None when it cannot
+    be decoded.
+
+    Args:
+        data (bytes) : the content of the image file.
+        flags (int) : the OpenCV imdecode flags.
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise IOError("the data could not be decoded as an image")
+    return image
+
+
+def _exif_orientation(payload: bytes) -> int:
+    """
+    This function returns the orientation stored in the EXIF payload of an APP1 segment, 1 (upright) if there is none.
+
+    Args:
+        payload (bytes) : the content of the APP1 segment.
+    """
+    if payload[:6] != b"Exif\x00\x00":
+        return 1
+    tiff = payload[6:]
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None or len(tiff) < 8:
+        return 1
+    (offset,) = struct.unpack(order + "I", tiff[4:8])
+    if len(tiff) < offset + 2:
+        return 1
+    (count,) = struct.unpack(order + "H", tiff[offset : offset + 2])
+    for start in range(offset + 2, offset + 2 + 12 * count, 12):
+        entry = tiff[start : start + 12]
+        if len(entry) < 12:
+            break
+        tag, kind, _, value = struct.unpack(order + "HHIH", entry[:10])
+        if tag == _EXIF_ORIENTATION_TAG and kind == _EXIF_SHORT:
+            return value
+    return 1
+
+
+def _read_jpeg_size(file) -> Optional[Tuple[int, int]]:
+    orientation = 1
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # Fill byte, the marker starts one byte later
+            file.seek(-1, 1)
+            continue
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            # Standalone markers without payload
+            continue
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack(">H", length)
+        if marker[1] in _JPEG_SOF_MARKERS:
+            header = file.read(5)
+            if len(header) < 5:
+                return None
+            height, width = struct.unpack(">xHH", header)
+            if orientation in _TRANSPOSED_ORIENTATIONS:
+                # OpenCV rotates the image by its EXIF orientation while decoding it
+                return height, width
+            return width, height
+        if marker[1] == _JPEG_APP1 and orientation == 1:
+            payload = file.read(length - 2)
+            orientation = _exif_orientation(payload)
+            continue
+        file.seek(length - 2, 1)
+
+
+def read_image_header(source: Union[str, BinaryIO]) -> Optional[Tuple[str, int, int]]:
+    """
+    This function reads the format and the (width, height) of an image from its header only, without decoding it.
+    The size is the one of the image returned by `cv2.imread`, i.e. swapped for JPEG images whose EXIF orientation
+    rotates them by 90 degrees. JPEG, PNG, BMP and GIF are supported, None is returned for any other format.
+
+    Args:
+        source (str or file) : the path of the image, or a binary file positioned at its start, e.g. a
+        `io.BytesIO` of its content.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return read_image_header(file)
+    start = source.tell()
+    signature = source.read(26)
+    if signature[:2] == b"\xff\xd8":
+        source.seek(start + 2)
+        size = _read_jpeg_size(source)
+        return None if size is None else ("jpeg", size[0], size[1])
+    if signature[:8] == b"\x89PNG\r\n\x1a\n" and len(signature) >= 24:
+        width, height = struct.unpack(">II", signature[16:24])
+        return "png", width, height
+    if signature[:2] == b"BM" and len(signature) >= 26:
+        width, height = struct.unpack("<ii", signature[18:26])
+        return "bmp", width, abs(height)
+    if signature[:6] in (b"GIF87a", b"GIF89a") and len(signature) >= 10:
+        width, height = struct.unpack("<HH", signature[6:10])
+        return "gif", width, height
+    return None
+
+
+def reduced_imread_flags(
+    source_size: Tuple[int, int],
+    target_size: Tuple[int, int],
+    flags: int = cv2.IMREAD_COLOR,
+) -> int:
+    """
+    This function returns the imread flags decoding an image at the smallest reduced resolution that is still at
+    least the target size, whatever the EXIF orientation of the image.
+
+    Args:
+        source_size (tuple) : the (width, height) of the image.
+        target_size (tuple) : the (width, height) the image will be resized to.
+        flags (int) : the imread flags, only IMREAD_COLOR and IMREAD_GRAYSCALE can be reduced.
+    """
+    if flags not in _REDUCED_FLAGS:
+        return flags
+    (width, height), (target_width, target_height) = source_size, target_size
+    # The image may be rotated by its EXIF orientation, both orientations must fit the target
+    ratio = min(
+        width / target_width,
+        height / target_height,
+        width / target_height,
+        height / target_width,
+    )
+    for factor in (8, 4, 2):
+        if factor <= ratio:
+            return _REDUCED_FLAGS[flags][factor]
+    return flags
+
+
+def imread_resized(
+    path: str,
+    width: int,
+    height: int,
+    inter: int = cv2.INTER_AREA,
+    flags: int = cv2.IMREAD_COLOR,
+) -> np.ndarray:
+    """
+    This function decodes an image to the given size, using a reduced JPEG decoding when the image is large enough.
+
+    Args:
+        path (str) : the path of the image.
+        width (int) : the width of the decoded image.
+        height (int) : the height of the decoded image.
+        inter (int) : the OpenCV interpolation finishing the resize.
+        flags (int) : the OpenCV imread flags.
+    """
+    image = imread(path, reduced_decoding_flags(path, (width, height), flags))
+    return cv2.resize(image, (width, height), interpolation=inter)
+
+
+def reduced_decoding_flags(
+    source: Union[str, BinaryIO],
+    target_size: Tuple[int, int],
+    flags: int = cv2.IMREAD_COLOR,
+) -> int:
+    """
+    This function returns the imread flags to decode an image file for a given target size. Only JPEG images are
+    decoded at a reduced resolution, since other formats would be decoded in full and then downscaled by OpenCV.
+
+    Args:
+        source (str or file) : the path of the image, or a binary file positioned at its start.
+        target_size (tuple) : the (width, height) the image will be resized to.
+        flags (int) : the imread flags.
+    """
+    try:
+        header = read_image_header(source)
+    except OSError:
+        return flags
+    if header is None or header[0] != "jpeg":
+        return flags
+    return reduced_imread_flags(header[1:], target_size, flags)
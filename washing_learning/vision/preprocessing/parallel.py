@@ -0,0 +1,237 @@
+"""
+Implement a thread-pool executor running preprocessors on a batch or on a list of image paths in parallel.
+
+OpenCV releases the GIL in its heavy functions such as `cv2.resize` or `cv2.imread`, threads are thus enough to use
+every core. Since OpenCV also parallelizes internally, the executor limits OpenCV to `opencv_threads` threads while
+it runs to avoid oversubscribing the CPU.
+
+Example:
+    >>> with ParallelExecutor([SimplePreprocessor(224, 224), SimpleScaler(dtype="float32")], num_workers=8) as executor:
+    >>>     batch = executor.map(images)
+    >>>     batch = executor.map_paths(paths)
+"""
+# Standard libraries
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.pipeline import Pipeline
+from washing_learning.vision.preprocessing.preprocessors import (
+    BasePreprocessor,
+    Images,
+    _batch_signature,
+    _check_output,
+)
+
+__all__ = ["ParallelExecutor", "benchmark_scaling", "limit_opencv_threads"]
+
+Preprocessors = Union[BasePreprocessor, Sequence[BasePreprocessor]]
+
+# The OpenCV thread count is process-wide, it is set by the first active limit and restored by the last one to exit
+_opencv_threads_lock = threading.Lock()
+_opencv_threads_users = 0
+_opencv_threads_previous = 0
+
+
+@contextmanager
+def limit_opencv_threads(num_threads: int) -> Iterator[None]:
+    """
+    This context manager sets the number of threads OpenCV uses internally and restores the previous value on exit.
+    The setting is process-wide and reference counted: when several limits overlap, e.g. in concurrent executors, the
+    first one to enter sets the thread count and the last one to exit restores the original value.
+
+    Args:
+        num_threads (int) : the number of OpenCV threads, 0 disables OpenCV threading.
+    """
+    global _opencv_threads_users, _opencv_threads_previous
+    with _opencv_threads_lock:
+        if _opencv_threads_users == 0:
+            _opencv_threads_previous = cv2.getNumThreads()
+            cv2.setNumThreads(num_threads)
+        _opencv_threads_users += 1
+    try:
+        yield
+    finally:
+        with _opencv_threads_lock:
+            _opencv_threads_users -= 1
+            if _opencv_threads_users == 0:
+                cv2.setNumThreads(_opencv_threads_previous)
+
+
+def _as_pipeline(preprocessors: Preprocessors) -> BasePreprocessor:
+    """
+    This function wraps a list of preprocessors into a :class:`Pipeline`.
+
+    Args:
+        preprocessors (BasePreprocessor or list) : a preprocessor or a list of preprocessors.
+    """
+    if isinstance(preprocessors, BasePreprocessor):
+        return preprocessors
+    return Pipeline(preprocessors)
+
+
+class ParallelExecutor:
+    """
+    Shard a batch or a list of paths into chunks preprocessed by a pool of threads. Results are written in order into
+    a single preallocated buffer.
+
+    Args:
+        preprocessors (BasePreprocessor or list) : the preprocessors to apply, a list is compiled into a
+        :class:`Pipeline`.
+        num_workers (int, optional) : the number of threads, defaults to the number of CPUs.
+        chunk_size (int) : the number of images handled by a thread at once.
+        opencv_threads (int) : the number of internal OpenCV threads while the executor runs. The default, 1, leaves
+        the whole parallelism to the executor.
+    """
+
+    def __init__(
+        self,
+        preprocessors: Preprocessors,
+        num_workers: Optional[int] = None,
+        chunk_size: int = 16,
+        opencv_threads: int = 1,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        self.preprocessor = _as_pipeline(preprocessors)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.opencv_threads = opencv_threads
+        self._pool = ThreadPoolExecutor(max_workers=self.num_workers)
+
+    def __enter__(self) -> "ParallelExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        This method shuts the thread pool down.
+        """
+        self._pool.shutdown(wait=True)
+
+    def _chunks(self, first: int, last: int) -> List[Tuple[int, int]]:
+        return [
+            (start, min(start + self.chunk_size, last))
+            for start in range(first, last, self.chunk_size)
+        ]
+
+    def _run(self, tasks) -> None:
+        with limit_opencv_threads(self.opencv_threads):
+            futures = [self._pool.submit(*task) for task in tasks]
+            for future in futures:
+                # Propagates the first worker exception
+                future.result()
+
+    def map(self, images: Images, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        This method preprocesses a batch in parallel.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+            out (arraylike, optional) : the preallocated buffer receiving the batch, allocated by the
+            `allocate_batch` of the preprocessors if not given.
+        """
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.preprocessor.output_shape(shape[1:])
+        expected_dtype = self.preprocessor.output_dtype(dtype)
+        if out is None:
+            out = self.preprocessor.allocate_batch(images)
+        else:
+            _check_output(out, expected_shape, expected_dtype)
+        self._run(
+            (
+                self.preprocessor.preprocess_batch,
+                images[start:stop],
+                out[start:stop],
+            )
+            for start, stop in self._chunks(0, shape[0])
+        )
+        return out
+
+    def _map_paths_chunk(
+        self, paths: Sequence[str], out: np.ndarray, flags: int
+    ) -> None:
+        for i, path in enumerate(paths):
+            out[i] = self.preprocessor.load(path, flags)
+
+    def map_paths(
+        self,
+        paths: Sequence[str],
+        out: Optional[np.ndarray] = None,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> np.ndarray:
+        """
+        This method reads and preprocesses a list of images in parallel. The preprocessors must produce images of a
+        single shape, e.g. by resizing them, in which case large JPEG images are decoded at a reduced resolution.
+
+        Args:
+            paths (list of str) : the paths of the images.
+            out (arraylike, optional) : the preallocated buffer receiving the batch.
+            flags (int) : the OpenCV imread flags.
+        """
+        if len(paths) == 0:
+            raise ValueError("paths must contain at least one path")
+        first = self.preprocessor.load(paths[0], flags)
+        expected_shape = (len(paths),) + first.shape
+        if out is None:
+            out = np.empty(expected_shape, dtype=first.dtype)
+        else:
+            _check_output(out, expected_shape, first.dtype)
+        out[0] = first
+        self._run(
+            (self._map_paths_chunk, paths[start:stop], out[start:stop], flags)
+            for start, stop in self._chunks(1, len(paths))
+        )
+        return out
+
+
+def benchmark_scaling(
+    preprocessors: Preprocessors,
+    images: Images,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 16,
+    repeats: int = 3,
+) -> List[Tuple[int, float, float]]:
+    """
+    This function measures how a :class:`ParallelExecutor` scales from 1 to `max_workers` threads on a given batch.
+
+    Args:
+        preprocessors (BasePreprocessor or list) : the preprocessors to benchmark.
+        images (arraylike or list of arraylike) : the batch used for the benchmark.
+        max_workers (int, optional) : the largest number of threads tested, defaults to the number of CPUs.
+        chunk_size (int) : the number of images handled by a thread at once.
+        repeats (int) : the best time out of `repeats` runs is kept for each number of threads.
+
+    Returns:
+        a list of (number of threads, best time in seconds, speedup over a single thread) tuples.
+
+    Example:
+        >>> for workers, seconds, speedup in benchmark_scaling(preprocessors, images):
+        >>>     print(f"{workers:>3} threads: {seconds:.4f} s (x{speedup:.2f})")
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    preprocessor = _as_pipeline(preprocessors)
+    out = preprocessor.allocate_batch(images)
+    curve = []
+    for num_workers in range(1, max_workers + 1):
+        with ParallelExecutor(
+            preprocessor, num_workers=num_workers, chunk_size=chunk_size
+        ) as executor:
+            executor.map(images, out=out)  # warm-up
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                executor.map(images, out=out)
+                best = min(best, time.perf_counter() - start)
+        curve.append((num_workers, best, curve[0][1] / best if curve else 1.0))
+    return curve
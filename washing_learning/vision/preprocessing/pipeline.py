@@ -0,0 +1,337 @@
+"""
+Implement a pipeline that compiles a chain of preprocessors into as few passes over the data as possible.
+
+Chaining preprocessors by hand creates a full-size intermediate copy at every step. The :class:`Pipeline` instead
+fuses adjacent resize, scale and dtype cast steps into a single stage writing directly into one output buffer.
+
+Example:
+    >>> pipeline = Pipeline([SimplePreprocessor(224, 224), SimpleScaler()], dtype=np.float32)
+    >>> print(pipeline.explain())
+    stage 0: fused [SimplePreprocessor(224x224), SimpleScaler(1/255.0), cast(float32)]
+    >>> batch = pipeline.preprocess_batch(images)
+"""
+# Standard libraries
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import (
+    BasePreprocessor,
+    Images,
+    SimplePreprocessor,
+    SimpleScaler,
+    _batch_signature,
+    _check_output,
+)
+
+__all__ = ["Pipeline"]
+
+
+def _describe(preprocessor: BasePreprocessor) -> str:
+    """
+    This function returns a short human-readable description of a preprocessor used by :meth:`Pipeline.explain`.
+
+    Args:
+        preprocessor (BasePreprocessor) : the preprocessor to describe.
+    """
+    if isinstance(preprocessor, SimplePreprocessor):
+        return (
+            f"{type(preprocessor).__name__}({preprocessor.width}x{preprocessor.height})"
+        )
+    if isinstance(preprocessor, SimpleScaler):
+        if preprocessor.dtype is not None:
+            return f"SimpleScaler(1/{preprocessor.factor}, {preprocessor.dtype})"
+        return f"SimpleScaler(1/{preprocessor.factor})"
+    return type(preprocessor).__name__
+
+
+class _FusedStage(BasePreprocessor):
+    """
+    A stage made of an optional resize followed by an optional scaling and an optional dtype cast, executed with a
+    single allocation of the output.
+
+    Args:
+        resize (SimplePreprocessor, optional) : the resize step of the stage.
+        scaler (SimpleScaler, optional) : a scaler equivalent to every fused :class:`SimpleScaler`.
+        dtype (dtype, optional) : the output dtype of the stage, overriding the one of the scaler.
+    """
+
+    def __init__(
+        self,
+        resize: Optional[SimplePreprocessor] = None,
+        scaler: Optional[SimpleScaler] = None,
+        dtype: Optional[np.dtype] = None,
+    ) -> None:
+        self.resize = resize
+        self.scaler = scaler
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.steps: List[BasePreprocessor] = []
+        self._local = threading.local()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # The scratch buffers are recreated on demand, thread-local storage cannot be pickled
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _scratch(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        This method returns the buffer receiving one resized image before it is scaled into the output. It is
+        allocated once per thread, since a stage may run in several threads at once, e.g. in a ParallelExecutor.
+
+        Args:
+            shape (tuple) : the shape of a resized image.
+            dtype (dtype) : the dtype of a resized image.
+        """
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None or scratch.shape != shape or scratch.dtype != dtype:
+            scratch = self._local.scratch = np.empty(shape, dtype=dtype)
+        return scratch
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        if self.resize is not None:
+            return self.resize.output_shape(shape)
+        return tuple(shape)
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        if self.dtype is not None:
+            return self.dtype
+        if self.scaler is not None:
+            return self.scaler.output_dtype(dtype)
+        return np.dtype(dtype)
+
+    def _finish(self, resized: np.ndarray, out: np.ndarray) -> None:
+        """
+        This method scales and casts a resized image or batch into its output buffer in one pass.
+
+        Args:
+            resized (arraylike) : the resized image or batch.
+            out (arraylike) : the output buffer.
+        """
+        if self.scaler is not None:
+            # uint8 inputs go through the scaler lookup table whenever out has the scaler dtype
+            self.scaler.preprocess(resized, out=out)
+        elif resized is not out:
+            np.copyto(out, resized, casting="unsafe")
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        shape = self.output_shape(image.shape)
+        if self.resize is not None:
+            image = self.resize.preprocess(image).reshape(shape)
+        return self._finish_image(image)
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        if self.resize is None:
+            return super(_FusedStage, self).load(path, flags)
+        return self._finish_image(self.resize.load(path, flags))
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        if self.resize is None:
+            return super(_FusedStage, self).load_bytes(data, flags, path)
+        return self._finish_image(self.resize.load_bytes(data, flags, path))
+
+    def _finish_image(self, image: np.ndarray) -> np.ndarray:
+        dtype = self.output_dtype(image.dtype)
+        if self.scaler is None and image.dtype == dtype:
+            return image
+        out = np.empty(image.shape, dtype=dtype)
+        self._finish(image, out)
+        return out
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        expected_dtype = self.output_dtype(dtype)
+        if out is None:
+            out = np.empty(expected_shape, dtype=expected_dtype)
+        else:
+            _check_output(out, expected_shape, expected_dtype)
+        if self.resize is None:
+            if isinstance(images, np.ndarray):
+                self._finish(images, out)
+            else:
+                for i in range(shape[0]):
+                    self._finish(images[i], out[i])
+        elif expected_dtype == dtype and self.scaler is None:
+            self.resize.preprocess_batch(images, out=out)
+        else:
+            # Each image is resized into a reused scratch buffer keeping the (usually uint8) source dtype, then scaled
+            # straight into its slot of out, the only allocation of the batch
+            scratch = self._scratch(expected_shape[1:], np.dtype(dtype))
+            size = (int(self.resize.width), int(self.resize.height))
+            region = self.resize.crop_plan(shape[1:])
+            for i in range(shape[0]):
+                resized = cv2.resize(
+                    images[i][region],
+                    size,
+                    dst=scratch,
+                    interpolation=self.resize.inter,
+                )
+                # OpenCV reallocates dst for single channel (H, W, 1) images
+                self._finish(resized.reshape(out[i].shape), out[i])
+        return out
+
+
+class Pipeline(BasePreprocessor):
+    """
+    A chain of preprocessors compiled into fused stages. Adjacent :class:`SimplePreprocessor`, :class:`SimpleScaler`
+    and the final dtype cast are merged into a single pass, any other preprocessor is run as its own stage.
+
+    Args:
+        preprocessors (list) : the preprocessors to apply, in order.
+        dtype (dtype, optional) : the dtype of the pipeline output. The cast is fused into the last stage.
+    """
+
+    def __init__(
+        self,
+        preprocessors: Sequence[BasePreprocessor],
+        dtype: Optional[np.dtype] = None,
+    ) -> None:
+        self.preprocessors = list(preprocessors)
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.stages = self._compile()
+
+    def _compile(self) -> List[BasePreprocessor]:
+        """
+        This method groups the preprocessors into stages, fusing every resize/scale run it can.
+        """
+        stages: List[BasePreprocessor] = []
+        current: Optional[_FusedStage] = None
+        for preprocessor in self.preprocessors:
+            if type(preprocessor) is SimplePreprocessor:
+                # A resize always opens a new stage, scaling is only fused after it
+                current = _FusedStage(resize=preprocessor)
+                stages.append(current)
+            elif type(preprocessor) is SimpleScaler:
+                if current is None:
+                    current = _FusedStage()
+                    stages.append(current)
+                current.scaler = (
+                    preprocessor
+                    if current.scaler is None
+                    else SimpleScaler(
+                        current.scaler.factor * preprocessor.factor,
+                        dtype=current.scaler.dtype
+                        if preprocessor.dtype is None
+                        else preprocessor.dtype,
+                        use_lut=current.scaler.use_lut and preprocessor.use_lut,
+                    )
+                )
+            else:
+                current = None
+                stages.append(preprocessor)
+                continue
+            current.steps.append(preprocessor)
+        if self.dtype is not None:
+            if stages and isinstance(stages[-1], _FusedStage):
+                stages[-1].dtype = self.dtype
+            else:
+                stages.append(_FusedStage(dtype=self.dtype))
+        return stages
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "class": type(self).__qualname__,
+            "preprocessors": [
+                preprocessor.get_config() for preprocessor in self.preprocessors
+            ],
+            "dtype": None if self.dtype is None else str(self.dtype),
+        }
+
+    def plan(self) -> List[Tuple[str, List[str]]]:
+        """
+        This method returns the execution plan, a list of (kind, steps) pairs where kind is either "fused" or
+        "single" and steps describes the preprocessors executed by the stage.
+        """
+        plan = []
+        for stage in self.stages:
+            if isinstance(stage, _FusedStage):
+                steps = [_describe(step) for step in stage.steps]
+                if stage.dtype is not None:
+                    steps.append(f"cast({stage.dtype})")
+                plan.append(("fused" if len(steps) > 1 else "single", steps))
+            else:
+                plan.append(("single", [_describe(stage)]))
+        return plan
+
+    def explain(self) -> str:
+        """
+        This method returns a readable view of :meth:`plan`, one line per stage.
+        """
+        return "\n".join(
+            f"stage {i}: {kind} [{', '.join(steps)}]"
+            for i, (kind, steps) in enumerate(self.plan())
+        )
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        for stage in self.stages:
+            shape = stage.output_shape(shape)
+        return tuple(shape)
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        for stage in self.stages:
+            dtype = stage.output_dtype(dtype)
+        return np.dtype(dtype)
+
+    def allocate_batch(self, images: Images) -> np.ndarray:
+        if not self.stages:
+            return super(Pipeline, self).allocate_batch(images)
+        shape, dtype = _batch_signature(images)
+        for stage in self.stages[:-1]:
+            shape = (shape[0],) + tuple(stage.output_shape(shape[1:]))
+            dtype = stage.output_dtype(dtype)
+        # The last stage allocates the batch, e.g. in pinned memory, given a placeholder of its input
+        return self.stages[-1].allocate_batch(
+            np.broadcast_to(np.zeros((), dtype=dtype), shape)
+        )
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        for stage in self.stages:
+            image = stage.preprocess(image)
+        return image
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        if not self.stages:
+            return super(Pipeline, self).load(path, flags)
+        # The first stage decodes the image, e.g. at a reduced resolution if it starts with a resize
+        image = self.stages[0].load(path, flags)
+        for stage in self.stages[1:]:
+            image = stage.preprocess(image)
+        return image
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        if not self.stages:
+            return super(Pipeline, self).load_bytes(data, flags, path)
+        image = self.stages[0].load_bytes(data, flags, path)
+        for stage in self.stages[1:]:
+            image = stage.preprocess(image)
+        return image
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if not self.stages:
+            shape, dtype = _batch_signature(images)
+            if out is None:
+                return np.array(images)
+            _check_output(out, shape, np.dtype(dtype))
+            np.copyto(out, np.asarray(images))
+            return out
+        last = len(self.stages) - 1
+        for i, stage in enumerate(self.stages):
+            images = stage.preprocess_batch(images, out=out if i == last else None)
+        return images
@@ -5,18 +5,243 @@ They all implements a :meth:`preprocess(self, image) <preprocess>` method and ca
 Example:
     >>> sp = SimplePreprocessor(128, 128)
     >>> ss = SimpleScaler()
+
+Every preprocessor also inherits from :class:`BasePreprocessor` and thus exposes a batched
+:meth:`preprocess_batch(self, images, out=None) <preprocess_batch>` method writing a whole batch into a single
+preallocated buffer:
+
+Example:
+    >>> batch = sp.preprocess_batch(images)  # images is a (N, H, W, C) array or a list of same-shape arrays
+    >>> batch = ss.preprocess_batch(batch, out=batch_buffer)
 """
+# Standard libraries
+import hashlib
+import io
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
 # Third-party libraries
 import cv2
-import imutils
 import numpy as np
-from sklearn.feature_extraction.image import extract_patches_2d
-from tensorflow.keras.preprocessing.image import img_to_array
 
-__all__ = ["SimplePreprocessor", "SimpleScaler"]
+# Local libraries
+from washing_learning.vision.preprocessing.decoding import (
+    imdecode,
+    imread,
+    reduced_decoding_flags,
+)
+
+__all__ = [
+    "AspectAwarePreprocessor",
+    "BasePreprocessor",
+    "ChannelsFirstConverter",
+    "Normalizer",
+    "PatchPreprocessor",
+    "PyramidPreprocessor",
+    "SimplePreprocessor",
+    "SimpleScaler",
+]
+
+Images = Union[np.ndarray, Sequence[np.ndarray]]
+
+
+def _batch_signature(images: Images) -> Tuple[Tuple[int, ...], np.dtype]:
+    """
+    This function returns the (N, H, W, C) shape and the dtype of a batch without copying it.
+
+    Args:
+        images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+    """
+    if isinstance(images, np.ndarray):
+        return images.shape, images.dtype
+    if len(images) == 0:
+        raise ValueError("images must contain at least one image")
+    first = images[0]
+    for image in images:
+        if image.shape != first.shape or image.dtype != first.dtype:
+            raise ValueError(
+                "every image of the batch must share the same shape and dtype, got"
+                f" {image.shape} {image.dtype} and {first.shape} {first.dtype}"
+            )
+    return (len(images),) + first.shape, first.dtype
+
+
+def _check_output(out: np.ndarray, shape: Tuple[int, ...], dtype: np.dtype) -> None:
+    """
+    This function ensures a caller-provided output buffer can receive a batch.
+
+    Args:
+        out (arraylike) : the preallocated output buffer.
+        shape (tuple) : the expected shape of the batch.
+        dtype (dtype) : the expected dtype of the batch.
+    """
+    if out.shape != tuple(shape):
+        raise ValueError(f"out must be of shape {tuple(shape)}, got {out.shape}")
+    if out.dtype != dtype:
+        raise TypeError(f"out must be of dtype {dtype}, got {out.dtype}")
+
+
+def _check_scaling_dtype(
+    dtype: Optional[Union[str, np.dtype]]
+) -> Optional[Union[str, np.dtype]]:
+    """
+    This function validates the output dtype of a scaling preprocessor.
+
+    Args:
+        dtype (str or dtype, optional) : either None, "bfloat16" or a floating numpy dtype.
+    """
+    if dtype is None or (isinstance(dtype, str) and dtype == "bfloat16"):
+        return dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise TypeError(
+            f"{dtype} is not supported, use float16, float32, float64 or bfloat16"
+            " instead"
+        )
+    return dtype
+
+
+def _round_to_bfloat16(array: np.ndarray) -> None:
+    """
+    This function rounds, in-place and to nearest even, a float32 array to the bfloat16 precision so that it can be
+    losslessly truncated to bfloat16 later on.
+
+    Args:
+        array (arraylike) : a float32 array.
+    """
+    bits = array.view(np.uint32)
+    bits += np.uint32(0x7FFF) + ((bits >> 16) & 1)
+    bits &= np.uint32(0xFFFF0000)
 
 
-class SimplePreprocessor:
+def _json_default(value: Any) -> Any:
+    """
+    This function converts the numpy values found in preprocessor configurations to JSON.
+
+    Args:
+        value (any) : the value json cannot serialize natively.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BasePreprocessor):
+        return value.get_config()
+    if isinstance(value, np.random.Generator):
+        # The state of a generator changes on every draw, only its kind defines the preprocessor
+        return type(value.bit_generator).__name__
+    return str(value)
+
+
+class BasePreprocessor:
+    """
+    The base class every preprocessor should inherit from. A subclass only has to implement
+    :meth:`preprocess(self, image) <preprocess>` to be usable in batch, however overriding
+    :meth:`output_shape`, :meth:`output_dtype` and :meth:`preprocess_batch` allows third-party preprocessors to join
+    the allocation-free fast path.
+    """
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        """
+        This method returns the shape of a preprocessed image.
+
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the input image.
+        """
+        return tuple(shape)
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        """
+        This method returns the dtype of a preprocessed image.
+
+        Args:
+            dtype (dtype) : the dtype of the input image.
+        """
+        return np.dtype(dtype)
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """
+        This method decodes an image file and preprocesses it. Preprocessors knowing their output size override it to
+        decode the image at a reduced resolution.
+
+        Args:
+            path (str) : the path of the image.
+            flags (int) : the OpenCV imread flags.
+        """
+        return self.preprocess(imread(path, flags))
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        This method decodes the content of an image file and preprocesses it, it is the counterpart of :meth:`load`
+        for loaders reading the files themselves. Both return the same image.
+
+        Args:
+            data (bytes) : the content of the image file.
+            flags (int) : the OpenCV imdecode flags.
+            path (str, optional) : the path the content was read from, e.g. to serve the image from a cache.
+        """
+        return self.preprocess(imdecode(data, flags))
+
+    def get_config(self) -> Dict[str, Any]:
+        """
+        This method returns the parameters defining the preprocessor, i.e. its public attributes and its class name.
+        """
+        config = {
+            name: value
+            for name, value in vars(self).items()
+            if not name.startswith("_")
+        }
+        config["class"] = type(self).__qualname__
+        return config
+
+    def fingerprint(self) -> str:
+        """
+        This method returns a hash of :meth:`get_config`, two preprocessors sharing a fingerprint output the same
+        images.
+        """
+        config = json.dumps(self.get_config(), sort_keys=True, default=_json_default)
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    def allocate_batch(self, images: Images) -> np.ndarray:
+        """
+        This method allocates the output buffer used by :meth:`preprocess_batch` for a given batch.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+        """
+        shape, dtype = _batch_signature(images)
+        return np.empty(
+            (shape[0],) + self.output_shape(shape[1:]), dtype=self.output_dtype(dtype)
+        )
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method preprocesses a whole batch and writes it into a single buffer.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+            out (arraylike, optional) : the preallocated buffer receiving the batch. It is allocated if not given.
+        """
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        expected_dtype = self.output_dtype(dtype)
+        if out is None:
+            out = np.empty(expected_shape, dtype=expected_dtype)
+        else:
+            _check_output(out, expected_shape, expected_dtype)
+        for i in range(shape[0]):
+            out[i] = self.preprocess(images[i])
+        return out
+
+
+class SimplePreprocessor(BasePreprocessor):
     """
     A simple preprocessor used to resize a given set of images. This class is `washing_learning.vision.datasets.dataloaders
     compatible.
@@ -36,18 +261,680 @@ class SimplePreprocessor:
 
         return cv2.resize(image, (self.width, self.height), interpolation=self.inter)
 
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        return (int(self.height), int(self.width)) + tuple(shape[2:])
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """
+        This method decodes and resizes an image. JPEG images at least twice as large as the target size are decoded
+        at 1/2, 1/4 or 1/8 of their resolution, cutting the decoding time and the peak memory.
+
+        Args:
+            path (str) : the path of the image.
+            flags (int) : the OpenCV imread flags.
+        """
+        flags = reduced_decoding_flags(path, (int(self.width), int(self.height)), flags)
+        return self.preprocess(imread(path, flags))
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        flags = reduced_decoding_flags(
+            io.BytesIO(data), (int(self.width), int(self.height)), flags
+        )
+        return self.preprocess(imdecode(data, flags))
+
+    def crop_plan(self, shape: Tuple[int, ...]) -> Tuple[slice, slice]:
+        """
+        This method returns the (rows, cols) region of an image that is resized, the whole image by default.
 
-class SimpleScaler:
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the image.
+        """
+        return slice(None), slice(None)
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        if out is None:
+            out = np.empty(expected_shape, dtype=dtype)
+        else:
+            _check_output(out, expected_shape, np.dtype(dtype))
+        size = (int(self.width), int(self.height))
+        # Every image of the batch shares the same shape, and thus the same region
+        region = self.crop_plan(shape[1:])
+        for i in range(shape[0]):
+            slot = out[i]
+            # OpenCV writes straight into the batch slot when dst matches the expected size and type
+            resized = cv2.resize(
+                images[i][region], size, dst=slot, interpolation=self.inter
+            )
+            if resized is not slot:
+                # OpenCV reallocates dst for single channel (H, W, 1) images
+                slot[...] = resized.reshape(slot.shape)
+        return out
+
+
+class AspectAwarePreprocessor(SimplePreprocessor):
+    """
+    A preprocessor resizing images without distorting them: the image is resized so that its shortest side fits the
+    target size, then the center of the longest side is cropped. Only the region of the image surviving the crop is
+    interpolated, and the crop plan is computed once per source shape.
+
+    Args:
+        width (int) : The image width after being processed
+        height (int) : The image height after being processed
+
+    Example:
+        >>> ap = AspectAwarePreprocessor(224, 224)
+        >>> ap.crop_plan((480, 640, 3))
+        (slice(0, 480, None), slice(80, 560, None))
+    """
+
+    def __init__(self, width: int, height: int, inter=cv2.INTER_AREA) -> None:
+        super(AspectAwarePreprocessor, self).__init__(width, height, inter=inter)
+        self._plans: Dict[Tuple[int, int], Tuple[slice, slice]] = {}
+
+    def crop_plan(self, shape: Tuple[int, ...]) -> Tuple[slice, slice]:
+        """
+        This method returns the (rows, cols) region of an image that survives the center crop. Resizing this region
+        to (height, width) is equivalent to resizing the whole image to the intermediate size
+        (H * scale, W * scale), with scale = max(width / W, height / H), then cropping its center.
+
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the image.
+        """
+        key = (shape[0], shape[1])
+        plan = self._plans.get(key)
+        if plan is None:
+            scale = max(self.width / shape[1], self.height / shape[0])
+            crop_height = min(shape[0], int(round(self.height / scale)))
+            crop_width = min(shape[1], int(round(self.width / scale)))
+            top = (shape[0] - crop_height) // 2
+            left = (shape[1] - crop_width) // 2
+            plan = slice(top, top + crop_height), slice(left, left + crop_width)
+            self._plans[key] = plan
+        return plan
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        return super(AspectAwarePreprocessor, self).preprocess(
+            image[self.crop_plan(image.shape)]
+        )
+
+
+class SimpleScaler(BasePreprocessor):
     """
     A simple preprocessors that scale every pixels in range [0, 1] (if `factor` = 255.)
 
     Args:
         factor (float) : The factor used to resize every pixel of the images.
+        dtype (str or dtype, optional) : The output dtype, either float16, float32, float64 or bfloat16. bfloat16
+        outputs are float32 arrays rounded to the bfloat16 precision. By default, the output follows the numpy
+        promotion of `image / factor`, i.e. float64 for integer images.
+        use_lut (bool) : Scale uint8 images through a precomputed 256-entry lookup table instead of a division.
 
+    Example:
+        >>> ss = SimpleScaler(dtype="float32")
+        >>> scaled = ss.preprocess(image)  # float32 instead of float64, half the memory
+        >>> ss.preprocess(image, out=buffer)  # writes into a caller buffer without any allocation
     """
 
-    def __init__(self, factor: float = 255.0) -> None:
+    def __init__(
+        self,
+        factor: float = 255.0,
+        dtype: Optional[Union[str, np.dtype]] = None,
+        use_lut: bool = True,
+    ) -> None:
         self.factor = factor
+        self.dtype = _check_scaling_dtype(dtype)
+        self.use_lut = use_lut
+        self._lut: Optional[np.ndarray] = None
+
+    @property
+    def lut(self) -> np.ndarray:
+        """
+        The 256-entry lookup table used to scale uint8 images, computed on first use.
+        """
+        if self._lut is None:
+            lut = np.arange(256, dtype=np.float64) / self.factor
+            lut = lut.astype(self.output_dtype(np.uint8))
+            if self.dtype == "bfloat16":
+                _round_to_bfloat16(lut)
+            self._lut = lut
+        return self._lut
+
+    def preprocess(
+        self, image: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method scales an image.
+
+        Args:
+            image (arraylike) : the image to scale.
+            out (arraylike, optional) : a buffer of the same shape as image receiving the result. It can be the
+            image itself for floating images, scaling it in-place.
+        """
+        use_lut = self.use_lut and image.dtype == np.uint8
+        if out is None:
+            if self.dtype is None and not use_lut:
+                return image / self.factor
+            out = np.empty(image.shape, dtype=self.output_dtype(image.dtype))
+        elif out.shape != image.shape:
+            raise ValueError(f"out must be of shape {image.shape}, got {out.shape}")
+        if use_lut and out.dtype == self.lut.dtype:
+            # uint8 values are valid indices, clip mode skips the bounds checking buffer
+            np.take(self.lut, image, out=out, mode="clip")
+        else:
+            np.divide(image, self.factor, out=out, casting="unsafe")
+            if self.dtype == "bfloat16" and out.dtype == np.float32:
+                _round_to_bfloat16(out)
+        return out
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        if self.dtype == "bfloat16":
+            return np.dtype(np.float32)
+        if self.dtype is not None:
+            return self.dtype
+        # Same promotion as `image / self.factor`, floating images keep their precision
+        dtype = np.dtype(dtype)
+        return dtype if dtype.kind in "fc" else np.dtype(np.float64)
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape, dtype = _batch_signature(images)
+        expected_dtype = self.output_dtype(dtype)
+        if out is None:
+            out = np.empty(shape, dtype=expected_dtype)
+        else:
+            _check_output(out, shape, expected_dtype)
+        if isinstance(images, np.ndarray):
+            self.preprocess(images, out=out)
+        else:
+            for i in range(shape[0]):
+                self.preprocess(images[i], out=out[i])
+        return out
+
+
+class Normalizer(BasePreprocessor):
+    """
+    A preprocessor normalizing every channel of the images with its mean and standard deviation, typically computed
+    by :class:`washing_learning.vision.preprocessing.statistics.RunningStatistics`. uint8 images are normalized in a
+    single pass through a per-channel lookup table, other images with two in-place passes over the output.
+
+    Args:
+        mean (arraylike) : The mean of each channel.
+        std (arraylike) : The standard deviation of each channel.
+        dtype (dtype) : The output dtype.
+        use_lut (bool) : Normalize uint8 images through a precomputed lookup table.
+
+    Example:
+        >>> normalizer = Normalizer(mean=[103.9, 116.8, 123.7], std=[57.4, 57.1, 58.4])
+        >>> normalized = normalizer.preprocess(image)
+    """
+
+    def __init__(
+        self,
+        mean: Sequence[float],
+        std: Sequence[float],
+        dtype: np.dtype = np.float32,
+        use_lut: bool = True,
+    ) -> None:
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        if self.mean.shape != self.std.shape or self.mean.ndim != 1:
+            raise ValueError("mean and std must be 1D sequences of the same length")
+        self.dtype = _check_scaling_dtype(dtype)
+        self.use_lut = use_lut
+        # (image - mean) / std is computed as image * scale + bias
+        self._scale = (1.0 / self.std).astype(self.output_dtype(np.float32))
+        self._bias = (-self.mean / self.std).astype(self.output_dtype(np.float32))
+        self._lut: Optional[np.ndarray] = None
+
+    @property
+    def lut(self) -> np.ndarray:
+        """
+        The (len(mean), 256) lookup table used to normalize uint8 images, computed on first use.
+        """
+        if self._lut is None:
+            values = np.arange(256, dtype=np.float64)
+            lut = (values[None, :] - self.mean[:, None]) / self.std[:, None]
+            lut = np.ascontiguousarray(lut, dtype=self.output_dtype(np.uint8))
+            if self.dtype == "bfloat16":
+                _round_to_bfloat16(lut)
+            self._lut = lut
+        return self._lut
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        if self.dtype == "bfloat16":
+            return np.dtype(np.float32)
+        return self.dtype
+
+    def preprocess(
+        self, image: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method normalizes an image, or a batch, whose last axis holds the channels.
+
+        Args:
+            image (arraylike) : the image to normalize.
+            out (arraylike, optional) : a buffer of the same shape as image receiving the result.
+        """
+        if image.shape[-1] != len(self.mean):
+            raise ValueError(
+                f"the image must have {len(self.mean)} channels on its last axis, got"
+                f" shape {image.shape}"
+            )
+        if out is None:
+            out = np.empty(image.shape, dtype=self.output_dtype(image.dtype))
+        elif out.shape != image.shape:
+            raise ValueError(f"out must be of shape {image.shape}, got {out.shape}")
+        if self.use_lut and image.dtype == np.uint8 and out.dtype == self.lut.dtype:
+            for channel in range(len(self.mean)):
+                np.take(
+                    self.lut[channel],
+                    image[..., channel],
+                    out=out[..., channel],
+                    mode="clip",
+                )
+            return out
+        np.multiply(image, self._scale, out=out, casting="unsafe")
+        np.add(out, self._bias, out=out, casting="unsafe")
+        if self.dtype == "bfloat16":
+            _round_to_bfloat16(out)
+        return out
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape, dtype = _batch_signature(images)
+        expected_dtype = self.output_dtype(dtype)
+        if out is None:
+            out = np.empty(shape, dtype=expected_dtype)
+        else:
+            _check_output(out, shape, expected_dtype)
+        if isinstance(images, np.ndarray):
+            self.preprocess(images, out=out)
+        else:
+            for i in range(shape[0]):
+                self.preprocess(images[i], out=out[i])
+        return out
+
+
+class PatchPreprocessor(BasePreprocessor):
+    """
+    A preprocessor extracting patches of a given size over a sliding window. Unlike
+    :func:`sklearn.feature_extraction.image.extract_patches_2d`, the patches are read-only strided views of the
+    image, no pixel is duplicated until a contiguous batch is requested with :meth:`extract` or
+    :meth:`preprocess_batch`.
+
+    Args:
+        width (int) : The width of the patches.
+        height (int) : The height of the patches.
+        stride (int or tuple of int, optional) : The (vertical, horizontal) step between two patches. It defaults to
+        the patch size, i.e. the image is tiled without overlap.
+        max_patches (int, optional) : If given, only `max_patches` patches drawn at random are kept.
+        rng (np.random.Generator, optional) : The random generator used to draw the patches.
+
+    Example:
+        >>> pp = PatchPreprocessor(256, 256)
+        >>> grid = pp.preprocess(image)  # (rows, cols, 256, 256, C) view, no copy
+        >>> batch = pp.extract(image)  # (rows * cols, 256, 256, C) contiguous copy
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        stride: Optional[Union[int, Tuple[int, int]]] = None,
+        max_patches: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        self.width = width
+        self.height = height
+        if stride is None:
+            stride = (height, width)
+        elif isinstance(stride, int):
+            stride = (stride, stride)
+        self.stride = tuple(stride)
+        self.max_patches = max_patches
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def grid_shape(self, shape: Tuple[int, ...]) -> Tuple[int, int]:
+        """
+        This method returns the number of (rows, cols) of patches fitting into an image.
+
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the image.
+        """
+        if shape[0] < self.height or shape[1] < self.width:
+            raise ValueError(
+                f"the image of shape {shape} is smaller than the patches"
+                f" ({self.height}, {self.width})"
+            )
+        return (
+            (shape[0] - self.height) // self.stride[0] + 1,
+            (shape[1] - self.width) // self.stride[1] + 1,
+        )
+
+    def view(self, image: np.ndarray) -> np.ndarray:
+        """
+        This method returns every patch of an image as a read-only (rows, cols, height, width[, C]) strided view.
+
+        Args:
+            image (arraylike) : the image to split into patches.
+        """
+        rows, cols = self.grid_shape(image.shape)
+        return np.lib.stride_tricks.as_strided(
+            image,
+            shape=(rows, cols, self.height, self.width) + image.shape[2:],
+            strides=(
+                image.strides[0] * self.stride[0],
+                image.strides[1] * self.stride[1],
+            )
+            + image.strides,
+            writeable=False,
+        )
+
+    def sample(self, shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method returns the (row, col) grid coordinates of the patches kept for an image, in memory order.
+
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the image.
+        """
+        rows, cols = self.grid_shape(shape)
+        if self.max_patches is None or self.max_patches >= rows * cols:
+            indices = np.arange(rows * cols)
+        else:
+            indices = np.sort(
+                self.rng.choice(rows * cols, size=self.max_patches, replace=False)
+            )
+        return np.divmod(indices, cols)
+
+    def extract(
+        self, image: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method copies the patches kept for an image into a contiguous (N, height, width[, C]) batch.
+
+        Args:
+            image (arraylike) : the image to split into patches.
+            out (arraylike, optional) : the preallocated buffer receiving the patches.
+        """
+        grid = self.view(image)
+        rows, cols = self.sample(image.shape)
+        if out is None:
+            return grid[rows, cols]
+        _check_output(out, (len(rows),) + grid.shape[2:], image.dtype)
+        if len(rows) == grid.shape[0] * grid.shape[1] and out.flags.c_contiguous:
+            np.copyto(out.reshape(grid.shape), grid)
+        else:
+            for i in range(len(rows)):
+                out[i] = grid[rows[i], cols[i]]
+        return out
+
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        """
+        This method returns the (rows, cols, height, width[, C]) view of every patch or, if `max_patches` is set, the
+        contiguous (max_patches, height, width[, C]) batch of the patches drawn.
+
+        Args:
+            image (arraylike) : the image to split into patches.
+        """
+        if self.max_patches is None:
+            return self.view(image)
+        return self.extract(image)
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        rows, cols = self.grid_shape(shape)
+        if self.max_patches is None:
+            return (rows, cols, self.height, self.width) + tuple(shape[2:])
+        return (min(self.max_patches, rows * cols), self.height, self.width) + tuple(
+            shape[2:]
+        )
+
+
+class PyramidPreprocessor(BasePreprocessor):
+    """
+    A preprocessor producing several scales of an image in a single call. Only the first level is resized from the
+    input, each next level is resized from the previous one, so that a pyramid of factor 2 costs about 4/3 of its
+    first level whatever the number of levels. The pyramid of an image is a flat array holding every level one after
+    the other, a batch of pyramids is thus a regular (N, size) batch whose levels are viewed with :meth:`split_levels`.
+
+    Args:
+        width (int) : The width of the first level.
+        height (int) : The height of the first level.
+        levels (int) : The number of levels.
+        factor (float) : The downscaling factor between two consecutive levels.
+        inter (int) : The OpenCV interpolation flag.
+
+    Example:
+        >>> pp = PyramidPreprocessor(512, 512, levels=3)
+        >>> large, medium, small = pp.split_levels(pp.preprocess(image))  # (512, 512, C), (256, 256, C), (128, 128, C)
+        >>> large, medium, small = pp.split_levels(pp.preprocess_batch(images))  # (N, 512, 512, C), ...
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        levels: int = 3,
+        factor: float = 2.0,
+        inter=cv2.INTER_AREA,
+    ) -> None:
+        if levels < 1 or factor <= 1:
+            raise ValueError("levels must be positive and factor larger than 1")
+        self.width = width
+        self.height = height
+        self.levels = levels
+        self.factor = factor
+        self.inter = inter
+        self._resizers = [
+            SimplePreprocessor(
+                max(1, int(round(width / factor**level))),
+                max(1, int(round(height / factor**level))),
+                inter=inter,
+            )
+            for level in range(levels)
+        ]
+
+    def level_shapes(self, shape: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        """
+        This method returns the shape of every level of the pyramid of an image.
+
+        Args:
+            shape (tuple) : the (H, W) or (H, W, C) shape of the image.
+        """
+        return [resizer.output_shape(shape) for resizer in self._resizers]
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        return (sum(int(np.prod(level)) for level in self.level_shapes(shape)),)
+
+    def split_levels(self, pyramids: np.ndarray) -> List[np.ndarray]:
+        """
+        This method returns the levels of a pyramid or of a batch of pyramids as (..., H_i, W_i[, C]) views. The
+        number of channels is deduced from the size of the pyramids, single channel levels have no channel axis.
+
+        Args:
+            pyramids (arraylike) : a (size,) pyramid or a (N, size) batch of pyramids.
+        """
+        pixels = sum(resizer.width * resizer.height for resizer in self._resizers)
+        channels, remainder = divmod(pyramids.shape[-1], pixels)
+        if remainder or not channels:
+            raise ValueError(
+                f"pyramids of size {pyramids.shape[-1]} do not match the levels of"
+                f" {pixels} pixels"
+            )
+        shape = (self.height, self.width) + ((channels,) if channels > 1 else ())
+        views, offset = [], 0
+        for level in self.level_shapes(shape):
+            size = int(np.prod(level))
+            views.append(
+                pyramids[..., offset : offset + size].reshape(
+                    pyramids.shape[:-1] + level
+                )
+            )
+            offset += size
+        return views
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """
+        This method decodes an image and computes its pyramid, JPEG images are decoded at a reduced resolution still
+        larger than the first level.
+
+        Args:
+            path (str) : the path of the image.
+            flags (int) : the OpenCV imread flags.
+        """
+        flags = reduced_decoding_flags(path, (int(self.width), int(self.height)), flags)
+        return self.preprocess(imread(path, flags))
+
+    def load_bytes(
+        self, data: bytes, flags: int = cv2.IMREAD_COLOR, path: Optional[str] = None
+    ) -> np.ndarray:
+        flags = reduced_decoding_flags(
+            io.BytesIO(data), (int(self.width), int(self.height)), flags
+        )
+        return self.preprocess(imdecode(data, flags))
 
     def preprocess(self, image: np.ndarray) -> np.ndarray:
-        return image / self.factor
+        return self.preprocess_batch(image[np.newaxis])[0]
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method computes the pyramid of every image of a batch into a (N, size) batch, see :meth:`split_levels`.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+            out (arraylike, optional) : the preallocated buffer receiving the batch. It is allocated if not given.
+        """
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        if out is None:
+            out = np.empty(expected_shape, dtype=dtype)
+        else:
+            _check_output(out, expected_shape, np.dtype(dtype))
+        offset = 0
+        source = images
+        for resizer, level in zip(self._resizers, self.level_shapes(shape[1:])):
+            size = int(np.prod(level))
+            # Every image of the level is contiguous, OpenCV writes straight into it
+            view = out[:, offset : offset + size].reshape((shape[0],) + level)
+            resizer.preprocess_batch(source, out=view)
+            source = view
+            offset += size
+        return out
+
+
+def _write_channels_first(
+    images: np.ndarray,
+    out: np.ndarray,
+    factor: Optional[float] = None,
+    reverse_channels: bool = False,
+) -> None:
+    """
+    This function writes (..., H, W, C) images into a (..., C, H, W) output in a single pass, fusing the channel
+    reversal, the layout change, the dtype cast and the scaling: the output is seen through a (..., H, W, C) view,
+    with reversed channels if needed, and written once by a single ufunc.
+
+    Args:
+        images (arraylike) : the (..., H, W, C) images.
+        out (arraylike) : the (..., C, H, W) output.
+        factor (float, optional) : if given, the pixels are divided by `factor`.
+        reverse_channels (bool) : reverse the order of the first three channels, e.g. BGR to RGB or BGRA to RGBA.
+        Images with less than three channels are left as they are.
+    """
+    target = np.moveaxis(out, -3, -1)
+    if reverse_channels and target.shape[-1] >= 3:
+        # Extra channels such as alpha keep their place, only the colour channels are reversed
+        pairs = [
+            (images[..., :3], target[..., 2::-1]),
+            (images[..., 3:], target[..., 3:]),
+        ]
+    else:
+        pairs = [(images, target)]
+    for source, view in pairs:
+        if factor is not None:
+            np.divide(source, factor, out=view, casting="unsafe")
+        else:
+            np.copyto(view, source, casting="unsafe")
+
+
+class ChannelsFirstConverter(BasePreprocessor):
+    """
+    A preprocessor turning the BGR (H, W, C) uint8 images of OpenCV into the RGB (C, H, W) float images most models
+    expect. The channel reordering, the transposition, the cast and the scaling are fused into a single write into a
+    contiguous output, no intermediate array is created.
+
+    Args:
+        dtype (dtype) : The output dtype.
+        factor (float, optional) : If given, the pixels are divided by `factor`, e.g. 255 to scale them in [0, 1].
+        rgb (bool) : Reverse the colour channels, i.e. convert BGR images to RGB and BGRA images to RGBA.
+
+    Example:
+        >>> converter = ChannelsFirstConverter()
+        >>> batch = converter.preprocess_batch(SimplePreprocessor(224, 224).preprocess_batch(images))  # (N, 3, 224, 224)
+    """
+
+    def __init__(
+        self,
+        dtype: np.dtype = np.float32,
+        factor: Optional[float] = 255.0,
+        rgb: bool = True,
+    ) -> None:
+        self.dtype = np.dtype(dtype)
+        self.factor = factor
+        self.rgb = rgb
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        if len(shape) == 2:
+            return (1,) + tuple(shape)
+        return (shape[2], shape[0], shape[1])
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        return self.dtype
+
+    def preprocess(
+        self, image: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        This method converts an (H, W[, C]) image into a (C, H, W) array.
+
+        Args:
+            image (arraylike) : the image to convert.
+            out (arraylike, optional) : the (C, H, W) buffer receiving the result.
+        """
+        expected_shape = self.output_shape(image.shape)
+        expected_dtype = self.output_dtype(image.dtype)
+        if out is None:
+            out = np.empty(expected_shape, dtype=expected_dtype)
+        else:
+            _check_output(out, expected_shape, expected_dtype)
+        _write_channels_first(
+            image.reshape(image.shape[:2] + (-1,)), out, self.factor, self.rgb
+        )
+        return out
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape, dtype = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        expected_dtype = self.output_dtype(dtype)
+        if out is None:
+            out = np.empty(expected_shape, dtype=expected_dtype)
+        else:
+            _check_output(out, expected_shape, expected_dtype)
+        if isinstance(images, np.ndarray):
+            _write_channels_first(
+                images.reshape(shape[:3] + (-1,)), out, self.factor, self.rgb
+            )
+        else:
+            for i in range(shape[0]):
+                self.preprocess(images[i], out=out[i])
+        return out
@@ -0,0 +1,181 @@
+"""
+Implement the storage of preprocessed batches as uint8 values with a per-channel scale and offset.
+
+Scaled or normalized images take 4 to 8 times the memory of the pixels they come from. A :class:`QuantizedBatch`
+keeps the uint8 values and the affine transform mapping them back to floats, which is lossless for the output of a
+:class:`SimpleScaler` or a :class:`Normalizer` applied to uint8 pixels. The float32 values are only computed when a
+sample or a chunk of samples is consumed, through the per-channel lookup table of a :class:`Normalizer`. Saved
+batches are memory-mapped back, which makes the quantized form usable as an on-disk cache format as well.
+
+Example:
+    >>> batch = QuantizedBatch.from_pixels(SimplePreprocessor(224, 224).preprocess_batch(images), SimpleScaler())
+    >>> batch.save("cache/batch-0")
+    >>> for chunk in QuantizedBatch.load("cache/batch-0").chunks(64):
+    >>>     ...  # (64, 224, 224, 3) float32
+"""
+# Standard libraries
+import json
+import os
+from typing import Iterator, Optional, Sequence, Tuple, Union
+
+# Third-party libraries
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import (
+    BasePreprocessor,
+    Normalizer,
+    SimpleScaler,
+    _check_output,
+)
+
+__all__ = ["QuantizedBatch"]
+
+_DATA_FILE = "data.npy"
+_META_FILE = "quantization.json"
+
+
+class QuantizedBatch:
+    """
+    A batch of (N, ..., C) uint8 values standing for `data * scale + offset`, with one scale and one offset per
+    channel.
+
+    Args:
+        data (arraylike) : the (N, ..., C) uint8 values, possibly memory-mapped.
+        scale (arraylike) : the scale of each channel.
+        offset (arraylike) : the offset of each channel.
+    """
+
+    def __init__(
+        self, data: np.ndarray, scale: Sequence[float], offset: Sequence[float]
+    ) -> None:
+        if data.dtype != np.uint8:
+            raise TypeError(f"{data.dtype} data is not supported, use uint8 instead")
+        self.data = data
+        self.scale = np.broadcast_to(
+            np.asarray(scale, dtype=np.float64), data.shape[-1:]
+        ).copy()
+        self.offset = np.broadcast_to(
+            np.asarray(offset, dtype=np.float64), data.shape[-1:]
+        ).copy()
+        if np.any(self.scale == 0):
+            raise ValueError("the scale of every channel must be non-zero")
+        # data * scale + offset is the normalization (data - mean) / std
+        self._normalizer = Normalizer(
+            mean=-self.offset / self.scale, std=1.0 / self.scale, dtype=np.float32
+        )
+
+    @classmethod
+    def quantize(cls, array: np.ndarray, chunk_size: int = 64) -> "QuantizedBatch":
+        """
+        This method quantizes a floating batch on 256 levels spanning the range of each channel, chunk by chunk.
+
+        Args:
+            array (arraylike) : the (N, ..., C) floating batch.
+            chunk_size (int) : the number of samples quantized at once.
+        """
+        axes = tuple(range(array.ndim - 1))
+        low = np.asarray(array.min(axis=axes), dtype=np.float64)
+        high = np.asarray(array.max(axis=axes), dtype=np.float64)
+        # A constant channel is stored as zeros, its offset holds the value
+        scale = np.where(high > low, (high - low) / 255.0, 1.0)
+        data = np.empty(array.shape, dtype=np.uint8)
+        for start in range(0, len(array), chunk_size):
+            chunk = (array[start : start + chunk_size] - low) / scale
+            np.clip(np.rint(chunk, out=chunk), 0, 255, out=chunk)
+            data[start : start + chunk_size] = chunk
+        return cls(data, scale, low)
+
+    @classmethod
+    def from_pixels(
+        cls, pixels: np.ndarray, preprocessor: BasePreprocessor
+    ) -> "QuantizedBatch":
+        """
+        This method wraps uint8 pixels with the affine transform of a scaler or a normalizer, without any loss.
+
+        Args:
+            pixels (arraylike) : the (N, ..., C) uint8 batch the preprocessor would be applied to.
+            preprocessor (SimpleScaler or Normalizer) : the preprocessor whose output is stored.
+        """
+        if isinstance(preprocessor, SimpleScaler):
+            return cls(pixels, 1.0 / preprocessor.factor, 0.0)
+        if isinstance(preprocessor, Normalizer):
+            return cls(
+                pixels, 1.0 / preprocessor.std, -preprocessor.mean / preprocessor.std
+            )
+        raise TypeError(
+            f"{type(preprocessor).__name__} is not supported, use SimpleScaler or"
+            " Normalizer instead"
+        )
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> np.ndarray:
+        # Only the selected samples are dequantized
+        return self._normalizer.preprocess(np.asarray(self.data[index]))
+
+    def dequantize(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        This method returns the whole float32 batch.
+
+        Args:
+            out (arraylike, optional) : the float32 buffer receiving the batch.
+        """
+        if out is not None:
+            _check_output(out, self.shape, np.dtype(np.float32))
+        return self._normalizer.preprocess(np.asarray(self.data), out=out)
+
+    def chunks(
+        self, chunk_size: int, out: Optional[np.ndarray] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        This method yields the float32 batch chunk by chunk. Every chunk is written into the same buffer, a chunk is
+        thus overwritten by the next one.
+
+        Args:
+            chunk_size (int) : the number of samples per chunk.
+            out (arraylike, optional) : the (chunk_size, ...) float32 buffer receiving the chunks.
+        """
+        if out is None:
+            out = np.empty((chunk_size,) + self.shape[1:], dtype=np.float32)
+        else:
+            _check_output(out, (chunk_size,) + self.shape[1:], np.dtype(np.float32))
+        for start in range(0, len(self), chunk_size):
+            data = np.asarray(self.data[start : start + chunk_size])
+            yield self._normalizer.preprocess(data, out=out[: len(data)])
+
+    def save(self, path: str) -> None:
+        """
+        This method writes the batch into a directory, the values as a `.npy` file and the transform as JSON.
+
+        Args:
+            path (str) : the directory of the batch.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, _DATA_FILE), self.data)
+        meta = {"scale": self.scale.tolist(), "offset": self.offset.tolist()}
+        with open(os.path.join(path, _META_FILE), "w") as file:
+            json.dump(meta, file)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "QuantizedBatch":
+        """
+        This method reads back a batch written by :meth:`save`, memory-mapped by default.
+
+        Args:
+            path (str) : the directory of the batch.
+            mmap_mode (str, optional) : the `np.load` memory-map mode, None reads the values into memory.
+        """
+        with open(os.path.join(path, _META_FILE), "r") as file:
+            meta = json.load(file)
+        data = np.load(os.path.join(path, _DATA_FILE), mmap_mode=mmap_mode)
+        return cls(data, meta["scale"], meta["offset"])
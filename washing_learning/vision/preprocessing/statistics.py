@@ -0,0 +1,125 @@
+"""
+Implement the streaming computation of the per-channel statistics of an image dataset.
+
+The statistics are accumulated chunk by chunk with the parallel variant of Welford's algorithm (Chan et al.), the
+dataset never has to fit into memory and partial statistics computed by several workers can be merged exactly.
+
+Example:
+    >>> statistics = compute_statistics(ImageDataLoader("datasets/", [SimplePreprocessor(224, 224)]))
+    >>> normalizer = statistics.normalizer()
+    >>> normalized = normalizer.preprocess(image)
+"""
+# Standard libraries
+from typing import Iterable, Optional
+
+# Third-party libraries
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import Normalizer
+
+__all__ = ["RunningStatistics", "compute_statistics"]
+
+
+class RunningStatistics:
+    """
+    Accumulate the count, mean and variance of every channel over images or batches whose last axis holds the
+    channels. Instances are picklable, so that statistics computed in worker processes can be sent back and merged.
+
+    Args:
+        chunk_size (int) : the number of pixels converted to float64 at once, bounding the memory used by
+        :meth:`update`.
+    """
+
+    def __init__(self, chunk_size: int = 2**20) -> None:
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.mean: Optional[np.ndarray] = None
+        self._m2: Optional[np.ndarray] = None
+
+    def _merge(self, count: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        if self.count == 0:
+            self.count, self.mean, self._m2 = count, mean.copy(), m2.copy()
+            return
+        if mean.shape != self.mean.shape:
+            raise ValueError(
+                f"cannot merge statistics of {mean.shape[0]} and {self.mean.shape[0]}"
+                " channels"
+            )
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self._m2 += m2 + delta**2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, images: np.ndarray) -> "RunningStatistics":
+        """
+        This method adds an image or a batch of images to the statistics.
+
+        Args:
+            images (arraylike) : an image or a batch whose last axis holds the channels.
+        """
+        images = np.asarray(images)
+        pixels = images.reshape(-1, images.shape[-1])
+        for start in range(0, pixels.shape[0], self.chunk_size):
+            chunk = pixels[start : start + self.chunk_size].astype(np.float64)
+            mean = chunk.mean(axis=0)
+            chunk -= mean
+            self._merge(chunk.shape[0], mean, np.einsum("ij,ij->j", chunk, chunk))
+        return self
+
+    def merge(self, other: "RunningStatistics") -> "RunningStatistics":
+        """
+        This method merges the statistics accumulated by another instance, e.g. on another worker, into this one.
+
+        Args:
+            other (RunningStatistics) : the statistics to merge.
+        """
+        if other.count > 0:
+            self._merge(other.count, other.mean, other._m2)
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        """
+        The population variance of each channel.
+        """
+        if self.count == 0:
+            raise ValueError("no image has been added to the statistics")
+        return self._m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        """
+        The population standard deviation of each channel.
+        """
+        return np.sqrt(self.variance)
+
+    def normalizer(
+        self, dtype: np.dtype = np.float32, epsilon: float = 1e-8
+    ) -> Normalizer:
+        """
+        This method returns the :class:`Normalizer` applying the statistics.
+
+        Args:
+            dtype (dtype) : the output dtype of the normalizer.
+            epsilon (float) : added to the standard deviation to avoid dividing by zero on constant channels.
+        """
+        return Normalizer(self.mean, self.std + epsilon, dtype=dtype)
+
+
+def compute_statistics(
+    images: Iterable[np.ndarray], chunk_size: int = 2**20
+) -> RunningStatistics:
+    """
+    This function computes the per-channel statistics of an iterable of images or batches in a single pass.
+
+    Args:
+        images (iterable of arraylike) : images or batches whose last axis holds the channels, e.g. an
+        :class:`washing_learning.vision.datasets.dataloaders.ImageDataLoader`.
+        chunk_size (int) : the number of pixels converted to float64 at once.
+    """
+    statistics = RunningStatistics(chunk_size=chunk_size)
+    for batch in images:
+        statistics.update(batch)
+    return statistics
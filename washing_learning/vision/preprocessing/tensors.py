@@ -0,0 +1,154 @@
+"""
+Implement the conversion of preprocessed images to PyTorch tensors without going through TensorFlow.
+
+The BGR to RGB reordering, the HWC to CHW layout change, the dtype cast and the scaling are fused into the single
+write of the images into the output tensor, which can be allocated in pinned memory for asynchronous host to device
+copies.
+
+Example:
+    >>> converter = TensorConverter(pin_memory=True)
+    >>> batch = converter.preprocess_batch(SimplePreprocessor(224, 224).preprocess_batch(images))
+    >>> batch = batch.to("cuda", non_blocking=True)
+"""
+# Standard libraries
+from typing import List, Optional, Tuple, Union
+
+# Third-party libraries
+import numpy as np
+import torch
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import (
+    ChannelsFirstConverter,
+    Images,
+    _batch_signature,
+)
+
+__all__ = ["TensorConverter"]
+
+_NUMPY_DTYPES = {
+    torch.float16: np.float16,
+    torch.float32: np.float32,
+    torch.float64: np.float64,
+    torch.uint8: np.uint8,
+    torch.int16: np.int16,
+    torch.int32: np.int32,
+    torch.int64: np.int64,
+}
+
+
+class TensorConverter(ChannelsFirstConverter):
+    """
+    A :class:`ChannelsFirstConverter` writing into PyTorch tensors: (H, W, C) images and (N, H, W, C) batches become
+    contiguous (C, H, W) and (N, C, H, W) tensors. Numpy buffers, e.g. the ones of a :class:`ParallelExecutor` or a
+    :class:`Prefetcher`, are filled as by a :class:`ChannelsFirstConverter`, and :meth:`allocate_batch` allocates
+    them as views of tensors, in pinned memory if requested.
+
+    Args:
+        dtype (torch.dtype) : The dtype of the tensors.
+        factor (float, optional) : If given, the pixels are divided by `factor`, e.g. 255 to scale them in [0, 1].
+        rgb (bool) : Reverse the colour channels, i.e. convert the BGR(A) images of OpenCV to RGB(A).
+        pin_memory (bool) : Allocate the batches in pinned memory, to be copied to the GPU with `non_blocking=True`.
+        num_buffers (int) : The number of staging batches reused in turn by :meth:`preprocess_batch`. A returned
+        batch is overwritten `num_buffers` calls later, 0 allocates a new batch on every call.
+    """
+
+    def __init__(
+        self,
+        dtype: torch.dtype = torch.float32,
+        factor: Optional[float] = 255.0,
+        rgb: bool = True,
+        pin_memory: bool = False,
+        num_buffers: int = 0,
+    ) -> None:
+        if dtype not in _NUMPY_DTYPES:
+            raise TypeError(
+                f"{dtype} is not supported, use one of {list(_NUMPY_DTYPES)} instead"
+            )
+        super(TensorConverter, self).__init__(_NUMPY_DTYPES[dtype], factor, rgb)
+        self.dtype = dtype
+        self.pin_memory = pin_memory
+        self.num_buffers = num_buffers
+        self._buffers: List[torch.Tensor] = []
+        self._next_buffer = 0
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        return np.dtype(_NUMPY_DTYPES[self.dtype])
+
+    def _tensor(self, shape: Tuple[int, ...]) -> torch.Tensor:
+        return torch.empty(shape, dtype=self.dtype, pin_memory=self.pin_memory)
+
+    def _empty(self, shape: Tuple[int, ...]) -> torch.Tensor:
+        if self.num_buffers == 0:
+            return self._tensor(shape)
+        if len(self._buffers) < self.num_buffers:
+            self._buffers.append(self._tensor(shape))
+        elif self._buffers[self._next_buffer].shape != torch.Size(shape):
+            self._buffers[self._next_buffer] = self._tensor(shape)
+        buffer = self._buffers[self._next_buffer]
+        self._next_buffer = (self._next_buffer + 1) % self.num_buffers
+        return buffer
+
+    def _check_tensor(self, out: torch.Tensor, shape: Tuple[int, ...]) -> None:
+        if (
+            out.shape != torch.Size(shape)
+            or out.dtype != self.dtype
+            or not out.is_contiguous()
+        ):
+            raise ValueError(
+                f"out must be a contiguous {self.dtype} tensor of shape {shape}"
+            )
+
+    def allocate_batch(self, images: Images) -> np.ndarray:
+        """
+        This method allocates the batch as the numpy view of a new tensor, in pinned memory if `pin_memory` is set.
+        The tensor is recovered with `torch.from_numpy`, without any copy.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+        """
+        shape, _ = _batch_signature(images)
+        return self._tensor((shape[0],) + self.output_shape(shape[1:])).numpy()
+
+    def preprocess(
+        self,
+        image: np.ndarray,
+        out: Optional[Union[torch.Tensor, np.ndarray]] = None,
+    ) -> Union[torch.Tensor, np.ndarray]:
+        """
+        This method converts an (H, W[, C]) image into a (C, H, W) tensor.
+
+        Args:
+            image (arraylike) : the image to convert.
+            out (torch.Tensor or arraylike, optional) : the (C, H, W) tensor or array receiving the result.
+        """
+        if isinstance(out, np.ndarray):
+            return super(TensorConverter, self).preprocess(image, out=out)
+        expected_shape = self.output_shape(image.shape)
+        if out is None:
+            out = self._tensor(expected_shape)
+        else:
+            self._check_tensor(out, expected_shape)
+        super(TensorConverter, self).preprocess(image, out=out.numpy())
+        return out
+
+    def preprocess_batch(
+        self, images: Images, out: Optional[Union[torch.Tensor, np.ndarray]] = None
+    ) -> Union[torch.Tensor, np.ndarray]:
+        """
+        This method converts a batch into a (N, C, H, W) tensor, or writes it into a numpy buffer if `out` is one.
+
+        Args:
+            images (arraylike or list of arraylike) : a (N, H, W, C) array or a list of N same-shape arrays.
+            out (torch.Tensor or arraylike, optional) : a contiguous CPU tensor or an array receiving the batch.
+        """
+        if isinstance(out, np.ndarray):
+            return super(TensorConverter, self).preprocess_batch(images, out=out)
+        shape, _ = _batch_signature(images)
+        expected_shape = (shape[0],) + self.output_shape(shape[1:])
+        if out is None:
+            out = self._empty(expected_shape)
+        else:
+            self._check_tensor(out, expected_shape)
+        super(TensorConverter, self).preprocess_batch(images, out=out.numpy())
+        return out
@@ -0,0 +1,294 @@
+"""
+Implement the out-of-core preprocessing of images too large to fit in memory, e.g. whole-slide or satellite images.
+
+The source is a memory-mapped raw or `.npy` file and the output a memory-mapped `.npy` file, both are processed one
+output tile at a time. The source region read for a tile includes the margin needed by the interpolation kernel, so
+that the seams between tiles are invisible and the peak memory only depends on the tile size.
+
+Example:
+    >>> source = open_image_array("slide.raw", shape=(100000, 80000, 3))
+    >>> thumbnail = tiled_resize(source, "thumbnail.npy", 8000, 10000, inter=cv2.INTER_AREA)
+    >>> scaled = tiled_apply(thumbnail, "scaled.npy", SimpleScaler(dtype="float32"))
+"""
+# Standard libraries
+import math
+from typing import Optional, Tuple, Union
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import BasePreprocessor
+
+__all__ = ["open_image_array", "tiled_apply", "tiled_resize"]
+
+# The number of source pixels an interpolation kernel reaches on each side of a sample
+_MARGINS = {
+    cv2.INTER_LINEAR: 1,
+    cv2.INTER_CUBIC: 2,
+    cv2.INTER_LANCZOS4: 4,
+}
+_INTERPOLATIONS = (cv2.INTER_NEAREST, cv2.INTER_AREA) + tuple(_MARGINS)
+
+
+def open_image_array(
+    path: str,
+    shape: Optional[Tuple[int, ...]] = None,
+    dtype: np.dtype = np.uint8,
+    offset: int = 0,
+) -> np.ndarray:
+    """
+    This function memory-maps a `.npy` file or a raw file of pixels as a read-only (H, W) or (H, W, C) array, nothing
+    is read until a region of the array is accessed.
+
+    Args:
+        path (str) : the path of the file.
+        shape (tuple, optional) : the shape of the image, required for a raw file.
+        dtype (dtype) : the dtype of the pixels of a raw file.
+        offset (int) : the number of header bytes to skip in a raw file.
+    """
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    if shape is None:
+        raise ValueError("the shape of a raw image must be given")
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=tuple(shape))
+
+
+def _open_output(
+    output: Union[str, np.ndarray], shape: Tuple[int, ...], dtype: np.dtype
+) -> np.ndarray:
+    if isinstance(output, str):
+        return np.lib.format.open_memmap(output, mode="w+", dtype=dtype, shape=shape)
+    if output.shape != shape or output.dtype != dtype:
+        raise ValueError(f"output must be a {np.dtype(dtype)} array of shape {shape}")
+    return output
+
+
+def _tiles(height: int, width: int, tile_height: int, tile_width: int):
+    for top in range(0, height, tile_height):
+        for left in range(0, width, tile_width):
+            bottom = min(top + tile_height, height)
+            right = min(left + tile_width, width)
+            yield top, bottom, left, right
+
+
+def _cast(tile: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """
+    This function rounds and saturates a floating tile to an integer dtype, like OpenCV does.
+
+    Args:
+        tile (arraylike) : the floating tile.
+        dtype (dtype) : the dtype of the output.
+    """
+    if dtype.kind in "ui":
+        info = np.iinfo(dtype)
+        tile = np.clip(np.rint(tile), info.min, info.max)
+    return tile.astype(dtype, copy=False)
+
+
+def _box_average(
+    region: np.ndarray, start: float, scale: float, count: int, axis: int
+) -> np.ndarray:
+    """
+    This function averages `count` consecutive boxes of `scale` pixels along an axis, boxes starting and ending at
+    fractional positions included. The integral of the region is evaluated at the box edges from its prefix sum,
+    which is exactly the INTER_AREA downscaling of OpenCV.
+
+    Args:
+        region (arraylike) : the floating source region.
+        start (float) : the position of the first box in the region.
+        scale (float) : the size of a box, at least 1.
+        count (int) : the number of boxes.
+        axis (int) : the axis along which the boxes are averaged.
+    """
+    size = region.shape[axis]
+    edges = np.clip(start + scale * np.arange(count + 1), 0, size)
+    floor = np.floor(edges).astype(np.int64)
+    fraction = (edges - floor).reshape((-1,) + (1,) * (region.ndim - axis - 1))
+    prefix = np.cumsum(region, axis=axis)
+    prefix = np.concatenate(
+        [np.zeros_like(region.take([0], axis=axis)), prefix], axis=axis
+    )
+    integral = prefix.take(floor, axis=axis) + fraction * region.take(
+        np.minimum(floor, size - 1), axis=axis
+    )
+    return np.diff(integral, axis=axis) / scale
+
+
+def _nearest_indices(start: int, stop: int, scale: float, size: int) -> np.ndarray:
+    """
+    This function returns the source index of the output pixels [start, stop) along an axis, with the formula of the
+    INTER_NEAREST resize of OpenCV: floor(x * scale), scale being the inverse of the dst / src ratio.
+
+    Args:
+        start (int) : the first output pixel.
+        stop (int) : the end of the output pixels.
+        scale (float) : the source size of an output pixel.
+        size (int) : the size of the source along the axis.
+    """
+    return np.minimum(
+        np.floor(np.arange(start, stop) * scale).astype(np.int64), size - 1
+    )
+
+
+def _area_upscale_weights(
+    start: int, stop: int, inv_scale: float, size: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This function returns the two source indices interpolated by the output pixels [start, stop) along an axis and
+    the float32 weight of the second one, with the formulas of the INTER_AREA resize of OpenCV when it upscales: an
+    output pixel only blends its two source pixels if it overlaps both of them.
+
+    Args:
+        start (int) : the first output pixel.
+        stop (int) : the end of the output pixels.
+        inv_scale (float) : the dst / src ratio along the axis.
+        size (int) : the size of the source along the axis.
+    """
+    positions = np.arange(start, stop)
+    first = np.floor(positions * (1.0 / inv_scale)).astype(np.int64)
+    weight = ((positions + 1) - (first + 1) * inv_scale).astype(np.float32)
+    weight = np.where(weight <= 0, 0, weight - np.floor(weight)).astype(np.float32)
+    return np.minimum(first, size - 1), np.minimum(first + 1, size - 1), weight
+
+
+def tiled_resize(
+    source: Union[str, np.ndarray],
+    output: Union[str, np.ndarray],
+    width: int,
+    height: int,
+    inter: int = cv2.INTER_LINEAR,
+    tile_size: int = 2048,
+) -> np.ndarray:
+    """
+    This function resizes an image tile by tile and returns the resized image, memory-mapped if `output` is a path.
+    Each source region is bounded by `tile_size` pixels per side, plus the margin of the kernel. Every interpolation
+    uses the sampling positions of `cv2.resize`: nearest neighbour picks the same source pixels and gives exactly its
+    output. INTER_AREA is an exact box average when downscaling and a blend of the two overlapped source pixels with
+    the weights of OpenCV when upscaling. Linear, cubic and Lanczos interpolations are computed with `cv2.warpAffine`,
+    which rounds the sampling positions to 1/32 of a pixel. On 8-bit images, INTER_AREA, linear and cubic outputs
+    differ from `cv2.resize` by at most 1 grey level, Lanczos outputs by a few grey levels on high-frequency content.
+
+    Args:
+        source (str or arraylike) : a `.npy` path or a (H, W) or (H, W, C) array, typically memory-mapped.
+        output (str or arraylike) : the `.npy` path or the (height, width[, C]) array receiving the resized image.
+        width (int) : the width of the resized image.
+        height (int) : the height of the resized image.
+        inter (int) : the OpenCV interpolation flag.
+        tile_size (int) : the maximum side of the source region read at once.
+    """
+    if inter not in _INTERPOLATIONS:
+        raise TypeError(
+            f"interpolation {inter} is not supported, use one of"
+            f" {_INTERPOLATIONS} instead"
+        )
+    if isinstance(source, str):
+        source = open_image_array(source)
+    source_height, source_width = source.shape[:2]
+    # Same scales as cv2.resize, the rounding of the inverse matters for the source indices
+    inv_scale_y, inv_scale_x = height / source_height, width / source_width
+    scale_y, scale_x = 1.0 / inv_scale_y, 1.0 / inv_scale_x
+    output = _open_output(output, (height, width) + source.shape[2:], source.dtype)
+    area_upscale = inter == cv2.INTER_AREA and (scale_x < 1 or scale_y < 1)
+    margin = 1 if area_upscale else _MARGINS.get(inter, 0)
+    tile_height = max(1, int((tile_size - 2 * margin) / max(scale_y, 1)))
+    tile_width = max(1, int((tile_size - 2 * margin) / max(scale_x, 1)))
+    for top, bottom, left, right in _tiles(height, width, tile_height, tile_width):
+        target = output[top:bottom, left:right]
+        if inter == cv2.INTER_NEAREST:
+            rows = _nearest_indices(top, bottom, scale_y, source_height)
+            cols = _nearest_indices(left, right, scale_x, source_width)
+            region = source[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1]
+            target[...] = region[(rows - rows[0])[:, np.newaxis], cols - cols[0]]
+        elif area_upscale:
+            top_rows, bottom_rows, fy = _area_upscale_weights(
+                top, bottom, inv_scale_y, source_height
+            )
+            left_cols, right_cols, fx = _area_upscale_weights(
+                left, right, inv_scale_x, source_width
+            )
+            y0, x0 = top_rows[0], left_cols[0]
+            region = np.asarray(
+                source[y0 : bottom_rows[-1] + 1, x0 : right_cols[-1] + 1],
+                dtype=np.float32,
+            )
+            fx = fx.reshape((-1,) + (1,) * (region.ndim - 2))
+            fy = fy.reshape((-1,) + (1,) * (region.ndim - 1))
+            # Horizontal then vertical pass, like OpenCV
+            lefts, rights = region[:, left_cols - x0], region[:, right_cols - x0]
+            region = (1 - fx) * lefts + fx * rights
+            tops, bottoms = region[top_rows - y0], region[bottom_rows - y0]
+            region = (1 - fy) * tops + fy * bottoms
+            target[...] = _cast(region, output.dtype)
+        elif inter == cv2.INTER_AREA:
+            y0, y1 = int(top * scale_y), min(source_height, math.ceil(bottom * scale_y))
+            x0, x1 = int(left * scale_x), min(source_width, math.ceil(right * scale_x))
+            region = np.asarray(source[y0:y1, x0:x1], dtype=np.float64)
+            region = _box_average(region, top * scale_y - y0, scale_y, bottom - top, 0)
+            region = _box_average(region, left * scale_x - x0, scale_x, right - left, 1)
+            target[...] = _cast(region, output.dtype)
+        else:
+            # Pixel centers are aligned like cv2.resize: x_src = (x_dst + 0.5) * scale - 0.5
+            first_y, last_y = (top + 0.5) * scale_y - 0.5, (
+                bottom - 0.5
+            ) * scale_y - 0.5
+            first_x, last_x = (left + 0.5) * scale_x - 0.5, (
+                right - 0.5
+            ) * scale_x - 0.5
+            y0 = max(0, math.floor(first_y) - margin)
+            y1 = min(source_height, math.ceil(last_y) + margin + 1)
+            x0 = max(0, math.floor(first_x) - margin)
+            x1 = min(source_width, math.ceil(last_x) + margin + 1)
+            region = np.ascontiguousarray(source[y0:y1, x0:x1])
+            matrix = np.array(
+                [[scale_x, 0, first_x - x0], [0, scale_y, first_y - y0]],
+                dtype=np.float64,
+            )
+            # Replicating the border only matters at the edges of the image, like cv2.resize does
+            warped = cv2.warpAffine(
+                region,
+                matrix,
+                (right - left, bottom - top),
+                flags=inter | cv2.WARP_INVERSE_MAP,
+                borderMode=cv2.BORDER_REPLICATE,
+            )
+            target[...] = warped.reshape(target.shape)
+    if isinstance(output, np.memmap):
+        output.flush()
+    return output
+
+
+def tiled_apply(
+    source: Union[str, np.ndarray],
+    output: Union[str, np.ndarray],
+    preprocessor: BasePreprocessor,
+    tile_size: int = 2048,
+) -> np.ndarray:
+    """
+    This function applies a pixelwise preprocessor, e.g. a :class:`SimpleScaler` or a :class:`Normalizer`, tile by
+    tile and returns the result, memory-mapped if `output` is a path. Pixelwise preprocessors need no overlap.
+
+    Args:
+        source (str or arraylike) : a `.npy` path or a (H, W) or (H, W, C) array, typically memory-mapped.
+        output (str or arraylike) : the `.npy` path or the array receiving the preprocessed image.
+        preprocessor (BasePreprocessor) : a preprocessor keeping the shape of the images.
+        tile_size (int) : the side of the tiles.
+    """
+    if isinstance(source, str):
+        source = open_image_array(source)
+    if preprocessor.output_shape(source.shape) != source.shape:
+        raise ValueError(
+            f"{type(preprocessor).__name__} changes the shape of the images, use"
+            " tiled_resize instead"
+        )
+    output = _open_output(
+        output, source.shape, np.dtype(preprocessor.output_dtype(source.dtype))
+    )
+    for top, bottom, left, right in _tiles(*source.shape[:2], tile_size, tile_size):
+        output[top:bottom, left:right] = preprocessor.preprocess(
+            np.asarray(source[top:bottom, left:right])
+        )
+    if isinstance(output, np.memmap):
+        output.flush()
+    return output
@@ -0,0 +1,263 @@
+"""
+Implement a zero-copy transport of batches from worker processes to the training process.
+
+Sending a batch through a `multiprocessing.Queue` pickles it, which costs more than preprocessing it for large
+batches. The :class:`SharedBatchRing` instead preallocates a ring of batch slots in `multiprocessing.shared_memory`:
+workers write preprocessed pixels directly into a free slot and only send its index, the consumer reads the slot
+through a numpy view and hands it back once done. It requires Python 3.8 or later.
+
+Example:
+    >>> with SharedBatchRing(num_slots=4, batch_shape=(256, 224, 224, 3), dtype=np.uint8) as ring:
+    >>>     workers = [
+    >>>         multiprocessing.Process(target=fill_ring, args=(ring, preprocessor, chunk))
+    >>>         for chunk in np.array_split(paths, 4)
+    >>>     ]
+    >>>     for worker in workers:
+    >>>         worker.start()
+    >>>     for batch in ring.batches(workers):
+    >>>         ...  # batch is a view valid until the next iteration
+"""
+# Standard libraries
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+# Third-party libraries
+import cv2
+import numpy as np
+
+# Local libraries
+from washing_learning.vision.preprocessing.preprocessors import BasePreprocessor
+
+__all__ = ["SharedBatchRing", "fill_ring"]
+
+_DONE = -1
+_FAILED = -2
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    This function attaches to an existing shared memory block, only the owner of the ring unlinks it. Before Python
+    3.13 the block is registered again to the resource tracker, which is harmless for the workers started by the owner
+    since they share its tracker.
+
+    Args:
+        name (str) : the name of the shared memory block.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # The track argument only exists from Python 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedBatchRing:
+    """
+    A ring of preallocated batch slots in shared memory. Free slot indices and filled slot indices circulate through
+    two queues, the pixels never leave the shared memory. The ring can be passed to `multiprocessing.Process` as an
+    argument, the workers then attach to the same memory.
+
+    Args:
+        num_slots (int) : The number of batch slots. It bounds the number of batches in flight.
+        batch_shape (tuple) : The shape of a batch, e.g. (N, H, W, C).
+        dtype (dtype) : The dtype of the batches.
+        context (str, optional) : The multiprocessing start method of the workers, e.g. "spawn".
+    """
+
+    def __init__(
+        self,
+        num_slots: int,
+        batch_shape: Tuple[int, ...],
+        dtype: np.dtype = np.uint8,
+        context: Optional[str] = None,
+    ) -> None:
+        self.num_slots = num_slots
+        self.batch_shape = tuple(batch_shape)
+        self.dtype = np.dtype(dtype)
+        self._slot_bytes = int(np.prod(self.batch_shape)) * self.dtype.itemsize
+        self._memory = shared_memory.SharedMemory(
+            create=True, size=max(1, num_slots * self._slot_bytes)
+        )
+        self._owner = True
+        ctx = multiprocessing.get_context(context)
+        self._free = ctx.Queue()
+        self._ready = ctx.Queue()
+        for index in range(num_slots):
+            self._free.put(index)
+        self._slots = self._views()
+
+    def _views(self) -> np.ndarray:
+        return np.ndarray(
+            (self.num_slots,) + self.batch_shape,
+            dtype=self.dtype,
+            buffer=self._memory.buf,
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_memory"] = self._memory.name
+        state["_owner"] = False
+        del state["_slots"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._memory = _attach(state["_memory"])
+        self._slots = self._views()
+
+    def __enter__(self) -> "SharedBatchRing":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def acquire(self, timeout: Optional[float] = None) -> Tuple[int, np.ndarray]:
+        """
+        This method waits for a free slot and returns its index and its writable view. It is called by the workers.
+
+        Args:
+            timeout (float, optional) : the maximum number of seconds to wait, `queue.Empty` is raised after it.
+        """
+        index = self._free.get(timeout=timeout)
+        return index, self._slots[index]
+
+    def commit(self, index: int, length: Optional[int] = None) -> None:
+        """
+        This method hands a filled slot to the consumer. It is called by the workers.
+
+        Args:
+            index (int) : the index of the slot.
+            length (int, optional) : the number of valid samples in the slot, for a last incomplete batch.
+        """
+        self._ready.put((index, self.batch_shape[0] if length is None else length))
+
+    def done(self) -> None:
+        """
+        This method tells the consumer that a worker will not commit any other batch. It is called by the workers.
+        """
+        self._ready.put((_DONE, 0))
+
+    def fail(self, message: str, index: Optional[int] = None) -> None:
+        """
+        This method tells the consumer that a worker failed, the consumer then releases the slot the worker held and
+        raises a RuntimeError with `message`. It is called by the workers instead of :meth:`done`.
+
+        Args:
+            message (str) : the description of the failure.
+            index (int, optional) : the index of the slot held by the worker when it failed.
+        """
+        # The consumer releases the slot, a release put by the worker could be lost when the consumer terminates it
+        self._ready.put((_FAILED, (index, message)))
+
+    def release(self, index: int) -> None:
+        """
+        This method gives a consumed slot back to the workers. It is called by the consumer.
+
+        Args:
+            index (int) : the index of the slot.
+        """
+        self._free.put(index)
+
+    def batches(
+        self, workers: Sequence[multiprocessing.process.BaseProcess], poll: float = 0.1
+    ) -> Iterator[np.ndarray]:
+        """
+        This method yields the batches committed by the workers until every one of them is done. Each batch is a
+        view of its slot, released to the workers when the next batch is requested. If a worker fails or dies, the
+        other workers are terminated and a RuntimeError is raised, as when a worker exits with a non-zero exit code
+        once every worker is done.
+
+        Args:
+            workers (list of Process) : the started worker processes filling the ring.
+            poll (float) : the number of seconds between two liveness checks of the workers.
+        """
+        running = len(workers)
+        index = None
+        try:
+            while running:
+                try:
+                    index, length = self._ready.get(timeout=poll)
+                except queue.Empty:
+                    crashed = [
+                        worker
+                        for worker in workers
+                        if not worker.is_alive() and worker.exitcode != 0
+                    ]
+                    if crashed:
+                        raise RuntimeError(
+                            f"{len(crashed)} worker(s) died, exit codes:"
+                            f" {[worker.exitcode for worker in crashed]}"
+                        )
+                    continue
+                if index == _FAILED:
+                    # The slot of the failed worker is released on the way out
+                    index, message = length
+                    raise RuntimeError(f"a worker failed: {message}")
+                if index == _DONE:
+                    running -= 1
+                    index = None
+                    continue
+                yield self._slots[index][:length]
+                self.release(index)
+                index = None
+            for worker in workers:
+                worker.join()
+            crashed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+            if crashed:
+                raise RuntimeError(
+                    f"{len(crashed)} worker(s) exited with exit codes {crashed}"
+                )
+        except BaseException:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            raise
+        finally:
+            if index is not None:
+                self.release(index)
+
+    def close(self) -> None:
+        """
+        This method detaches from the shared memory, the owner of the ring also frees it. Views of the slots must not
+        be used afterwards.
+        """
+        del self._slots
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+            self._owner = False
+
+
+def fill_ring(
+    ring: SharedBatchRing,
+    preprocessor: BasePreprocessor,
+    paths: Sequence[str],
+    flags: int = cv2.IMREAD_COLOR,
+) -> None:
+    """
+    This function loads and preprocesses images directly into the slots of a ring, one batch per slot, and then
+    tells the consumer it is done. On an error, the consumer is told about the failure instead and releases the slot
+    being filled. It is meant to be the target of a worker process.
+
+    Args:
+        ring (SharedBatchRing) : the ring receiving the batches.
+        preprocessor (BasePreprocessor) : the preprocessor loading each image, it must output the shape of the
+        batches of the ring.
+        paths (list of str) : the paths of the images handled by the worker.
+        flags (int) : the OpenCV imread flags.
+    """
+    batch_size = ring.batch_shape[0]
+    index = None
+    try:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start : start + batch_size]
+            index, slot = ring.acquire()
+            for i, path in enumerate(chunk):
+                slot[i] = preprocessor.load(path, flags)
+            ring.commit(index, len(chunk))
+            index = None
+    except BaseException as error:
+        ring.fail(f"{type(error).__name__}: {error}", index)
+        raise
+    ring.done()
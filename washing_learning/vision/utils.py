@@ -2,9 +2,12 @@
 Every utility classes and functions related to vision in Deep Learning are listed below.
 """
 # Standard libraries
-from typing import Tuple
+from typing import Optional, Sequence, Tuple, Union
 
-__all__ = ["compute_padding_conv2d"]
+# Third-party libraries
+import numpy as np
+
+__all__ = ["collate_padded", "compute_padding_conv2d", "padded_size"]
 
 
 def compute_padding_conv2d(
@@ -40,3 +43,82 @@ def compute_padding_conv2d(
         )
     else:
         raise TypeError(f"{mode} is not existing, please use valid or same instead")
+
+
+def padded_size(
+    dimensions: Tuple[int, ...],
+    stride: Union[int, Tuple[int, ...]] = (32, 32),
+) -> Tuple[int, ...]:
+    """
+    This function rounds (height, width) dimensions up to the nearest multiple of the stride, so that every
+    "same" convolution of the network sees whole stride steps: with such dimensions, the padding returned by
+    :func:`compute_padding_conv2d` is the same for every image of a batch.
+
+    Args:
+        dimensions (tuple) : the (height, width) to round up.
+        stride (int or tuple) : the total (vertical, horizontal) stride of the network.
+    """
+    if isinstance(stride, int):
+        stride = (stride, stride)
+    return tuple(-(-size // step) * step for size, step in zip(dimensions, stride))
+
+
+def collate_padded(
+    images: Sequence[np.ndarray],
+    stride: Union[int, Tuple[int, ...]] = (32, 32),
+    value: float = 0,
+    out: Optional[np.ndarray] = None,
+    mask_out: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    This function batches images of different sizes by padding them at the bottom and at the right up to the largest
+    height and width of the batch, rounded by :func:`padded_size`, instead of the largest size of the whole dataset.
+    It returns the (N, H, W[, C]) batch and the (N, H, W) boolean masks of the valid pixels. Only the padding is
+    filled, every pixel is written once.
+
+    Args:
+        images (list of arraylike) : the (H_i, W_i[, C]) images, sharing their channels and their dtype.
+        stride (int or tuple) : the total (vertical, horizontal) stride of the network.
+        value (float) : the value of the padding.
+        out (arraylike, optional) : a flat contiguous buffer receiving the batch, reused across batches.
+        mask_out (arraylike, optional) : a flat contiguous boolean buffer receiving the masks.
+    """
+    if not len(images):
+        raise ValueError("the batch does not contain any image")
+    height, width = padded_size(
+        (
+            max(image.shape[0] for image in images),
+            max(image.shape[1] for image in images),
+        ),
+        stride,
+    )
+    shape = (len(images), height, width) + images[0].shape[2:]
+    dtype = images[0].dtype
+    size = int(np.prod(shape))
+    if out is None:
+        out = np.empty(size, dtype=dtype)
+    elif out.ndim != 1 or out.size < size or out.dtype != dtype:
+        raise ValueError(f"out must be a flat {dtype} buffer of at least {size} values")
+    mask_size = shape[0] * height * width
+    if mask_out is None:
+        mask_out = np.empty(mask_size, dtype=bool)
+    elif mask_out.ndim != 1 or mask_out.size < mask_size or mask_out.dtype != bool:
+        raise ValueError(
+            f"mask_out must be a flat bool buffer of at least {mask_size} values"
+        )
+    batch = out[:size].reshape(shape)
+    masks = mask_out[:mask_size].reshape(shape[:3])
+    for i, image in enumerate(images):
+        rows, cols = image.shape[:2]
+        if image.shape[2:] != shape[3:] or image.dtype != dtype:
+            raise ValueError(
+                f"the image {i} of shape {image.shape} and dtype {image.dtype} does not"
+                f" match the batch ({shape[3:]}, {dtype})"
+            )
+        batch[i, :rows, :cols] = image
+        batch[i, rows:] = value
+        batch[i, :rows, cols:] = value
+        masks[i, :rows, :cols] = True
+        masks[i, rows:] = False
+        masks[i, :rows, cols:] = False
+    return batch, masks